@@ -4,11 +4,19 @@ import struct
 import numpy as np
 from typing import Dict, Tuple, List, Optional
 from dataclasses import dataclass
+import os
 import argparse
 from src.visualize_events import events_to_video
-from src.read_raw import read_evt3_events
-from src.read_aedat import read_aedat3_events
-from src.write_formats import save_events_to_csv, save_trigger_events_to_csv, save_events_to_npz, save_events_to_h5
+from src.read_raw import read_evt3_events, read_evt3_header, iter_evt3_chunks, EVENT_DTYPE, TRIGGER_EVENT_DTYPE
+from src.read_raw import DECODER_VERSION as EVT3_DECODER_VERSION
+from src.read_aedat import read_aedat3_events, read_aedat3_header, iter_aedat3_chunks
+from src.read_aedat import DECODER_VERSION as AEDAT3_DECODER_VERSION
+from src.decode_cache import DecodeCache, DEFAULT_CACHE_DIR
+from src.backends import BACKENDS, resolve_backend
+from src.filters import BackgroundActivityFilter, RefractoryFilter, HotPixelFilter, hot_pixel_mask, compute_pixel_event_rate, apply_filters
+from src.write_formats import save_events_to_csv, save_trigger_events_to_csv, save_events_to_npz, save_events_to_h5, save_events_to_arrow, save_events_to_parquet, save_windows_to_npz
+from src.slice_events import slice_events_by_triggers
+from src.write_raw import save_events_to_raw
 
 def print_event_statistics(events: np.ndarray, trigger_events: np.ndarray, header: Dict[str, str]):
 	"""打印事件统计信息"""
@@ -55,16 +63,100 @@ def print_event_statistics(events: np.ndarray, trigger_events: np.ndarray, heade
 	print("\n=== 头部信息 ===")
 	print(header["header_text"])
 
+def build_filters(args, width: int, height: int) -> List:
+	"""根据命令行参数创建滤波器，按 热像素 -> 不应期 -> 背景活动 的顺序执行"""
+	filters = []
+	if args.hot_pixel_rate:
+		pixel_rate = np.load(args.hot_pixel_rate)
+		if pixel_rate.shape != (height, width):
+			raise ValueError(f"像素事件率文件尺寸 {pixel_rate.shape} 与传感器分辨率 {width}x{height} 不一致")
+		mask = hot_pixel_mask(pixel_rate, args.hot_pixel_threshold, args.hot_pixel_sigma)
+		print(f"热像素数量: {int(mask.sum())}")
+		filters.append(HotPixelFilter(mask))
+	if args.refractory_us:
+		filters.append(RefractoryFilter(width, height, args.refractory_us))
+	if args.ba_filter_us:
+		filters.append(BackgroundActivityFilter(width, height, args.ba_filter_us))
+	return filters
+
+def read_filtered_events(args, file_ext: str) -> Tuple[np.ndarray, np.ndarray, Dict[str, str]]:
+	"""分块解码并逐块滤波，滤波器状态在块之间保持"""
+	if file_ext == 'raw':
+		header, _ = read_evt3_header(args.input_file)
+		chunks = iter_evt3_chunks(args.input_file, args.max_events, backend=args.backend)
+	else:
+		header, _ = read_aedat3_header(args.input_file)
+		chunks = iter_aedat3_chunks(args.input_file, args.max_events, args.backend)
+	
+	width = int(header.get('width', 1280))
+	height = int(header.get('height', 720))
+	filters = build_filters(args, width, height)
+	print(f"解码后端: {resolve_backend(args.backend)}")
+	
+	events_chunks = []
+	trigger_chunks = []
+	for events, trigger_events in apply_filters(chunks, filters):
+		events_chunks.append(events)
+		trigger_chunks.append(trigger_events)
+	
+	for event_filter in filters:
+		print(event_filter)
+	
+	events = np.concatenate(events_chunks) if events_chunks else np.array([], dtype=EVENT_DTYPE)
+	trigger_events = np.concatenate(trigger_chunks) if trigger_chunks else np.array([], dtype=TRIGGER_EVENT_DTYPE)
+	return events, trigger_events, header
+
+def decode_events(args, file_ext: str) -> Tuple[np.ndarray, np.ndarray, Dict[str, str]]:
+	"""按命令行参数解码（并滤波）事件"""
+	if args.ba_filter_us or args.refractory_us or args.hot_pixel_rate:
+		return read_filtered_events(args, file_ext)
+	elif file_ext == 'raw':
+		return read_evt3_events(args.input_file, args.max_events, args.backend)
+	else:
+		return read_aedat3_events(args.input_file, args.max_events, args.backend)
+
+def decode_cache_key(cache: DecodeCache, args, file_ext: str) -> str:
+	"""缓存键：包含所有影响解码和滤波结果的参数"""
+	options = {
+		"max_events": args.max_events,
+		"ba_filter_us": args.ba_filter_us,
+		"refractory_us": args.refractory_us,
+	}
+	if args.hot_pixel_rate:
+		stat = os.stat(args.hot_pixel_rate)
+		options["hot_pixel"] = [os.path.abspath(args.hot_pixel_rate), stat.st_size, stat.st_mtime_ns,
+								args.hot_pixel_threshold, args.hot_pixel_sigma]
+	decoder_version = EVT3_DECODER_VERSION if file_ext == 'raw' else AEDAT3_DECODER_VERSION
+	return cache.make_key(args.input_file, file_ext, decoder_version, options, fast_hash=args.cache_hash)
+
 def main():
 	"""主函数"""
 	parser = argparse.ArgumentParser(description='Event Data Reader for RAW and AEDAT3 formats')
 	parser.add_argument('input_file', help='输入文件路径 (支持 .raw 和 .aedat 格式)')
 	parser.add_argument('--max-events', type=int, help='最大读取事件数量')
+	parser.add_argument('--backend', choices=BACKENDS, default='auto', help='解码后端 (auto: 安装了numba时使用numba，否则使用纯Python)')
 	parser.add_argument('--output-csv', help='输出CSV文件路径')
 	parser.add_argument('--output-trigger-csv', help='输出触发事件CSV文件路径')
 	parser.add_argument('--output-npz', help='输出NPZ文件路径')
 	parser.add_argument('--output-video', help='输出视频文件路径 (MP4格式)')
 	parser.add_argument('--output-h5', help='输出H5文件路径')
+	parser.add_argument('--output-arrow', help='输出Arrow IPC文件路径 (触发事件保存到 *_trigger.arrow)')
+	parser.add_argument('--output-parquet', help='输出Parquet文件路径 (触发事件保存到 *_trigger.parquet)')
+	parser.add_argument('--output-raw', help='输出EVT3格式RAW文件路径 (保留原RAW头部)')
+	parser.add_argument('--raw-wrap-timestamps', action='store_true', help='允许超过24位的时间戳，写RAW时按24位回绕')
+	parser.add_argument('--output-windows', help='按触发信号切分曝光窗口，输出窗口下标NPZ文件路径')
+	parser.add_argument('--window-trigger-id', type=int, default=0, help='切分窗口使用的触发通道ID')
+	parser.add_argument('--window-start-edge', type=int, choices=[0, 1], default=1, help='窗口开始的触发边沿 (1: 上升沿, 0: 下降沿)')
+	parser.add_argument('--ba-filter-us', type=int, help='背景活动滤波：8邻域内该时间（微秒）内没有其他事件的事件被去除')
+	parser.add_argument('--refractory-us', type=int, help='不应期滤波：同一像素上距离上一次事件不足该时间（微秒）的事件被去除')
+	parser.add_argument('--hot-pixel-rate', help='热像素屏蔽：像素事件率文件 (.npy，由 --output-pixel-rate 生成)')
+	parser.add_argument('--hot-pixel-threshold', type=float, help='热像素事件率阈值（事件/秒），默认按均值+N倍标准差自动确定')
+	parser.add_argument('--hot-pixel-sigma', type=float, default=5.0, help='自动热像素阈值的标准差倍数N')
+	parser.add_argument('--output-pixel-rate', help='输出像素事件率文件路径 (.npy)，用于 --hot-pixel-rate，--stats-only 时也会保存')
+	parser.add_argument('--cache', action='store_true', help='使用解码缓存：命中时直接读取上次的解码结果')
+	parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='解码缓存目录')
+	parser.add_argument('--cache-max-gb', type=float, default=20.0, help='解码缓存总大小上限 (GB)')
+	parser.add_argument('--cache-hash', action='store_true', help='缓存键中加入文件内容的快速哈希')
 	parser.add_argument('--stats-only', action='store_true', help='只显示统计信息，不保存数据')
 	
 	args = parser.parse_args()
@@ -75,18 +167,37 @@ def main():
 		print(f"正在读取文件: {args.input_file}")
 		print(f"检测到文件格式: {file_ext.upper()}")
 		
-		if file_ext == 'raw':
-			events, trigger_events, header = read_evt3_events(args.input_file, args.max_events)
-		elif file_ext == 'aedat':
-			events, trigger_events, header = read_aedat3_events(args.input_file, args.max_events)
-		else:
+		if file_ext not in ('raw', 'aedat'):
 			raise ValueError(f"不支持的文件格式: .{file_ext}。支持的格式: .raw, .aedat")
 		
+		if args.cache:
+			cache = DecodeCache(args.cache_dir, int(args.cache_max_gb * 1e9))
+			cache_key = decode_cache_key(cache, args, file_ext)
+			cached = cache.load(cache_key)
+			if cached is not None:
+				events, trigger_events, header = cached
+			else:
+				events, trigger_events, header = decode_events(args, file_ext)
+				cache.store(cache_key, events, trigger_events, header, args.input_file)
+		else:
+			events, trigger_events, header = decode_events(args, file_ext)
+		
 		# 打印统计信息
 		print_event_statistics(events, trigger_events, header)
 		
+		# 像素事件率用于后续的热像素屏蔽，--stats-only 时也保存
+		if args.output_pixel_rate:
+			width = int(header.get('width', 1280))
+			height = int(header.get('height', 720))
+			np.save(args.output_pixel_rate, compute_pixel_event_rate(events, width, height))
+			print(f"像素事件率已保存到: {args.output_pixel_rate}")
+		
 		# 保存数据
 		if not args.stats_only:
+			# 先切分窗口，出错时不会留下写了一半的输出
+			if args.output_windows:
+				windows = slice_events_by_triggers(events, trigger_events, args.window_trigger_id, args.window_start_edge)
+			
 			if args.output_csv:
 				save_events_to_csv(events, args.output_csv)
 			
@@ -99,6 +210,18 @@ def main():
 			if args.output_h5:
 				save_events_to_h5(events, trigger_events, header, args.output_h5)
 
+			if args.output_arrow:
+				save_events_to_arrow(events, trigger_events, header, args.output_arrow)
+
+			if args.output_parquet:
+				save_events_to_parquet(events, trigger_events, header, args.output_parquet)
+
+			if args.output_raw:
+				save_events_to_raw(events, trigger_events, header, args.output_raw, args.raw_wrap_timestamps)
+
+			if args.output_windows:
+				save_windows_to_npz(*windows, args.output_windows)
+
 			if args.output_video:
 				video_file = args.output_video
 				# 默认分辨率和帧率
@@ -108,7 +231,7 @@ def main():
 				print(f"视频已保存到: {video_file}")
 			
 			# 默认保存为NPZ格式
-			if not args.output_csv and not args.output_npz and not args.output_h5:
+			if not args.output_csv and not args.output_npz and not args.output_h5 and not args.output_arrow and not args.output_parquet and not args.output_raw:
 				if file_ext == 'raw':
 					default_output = args.input_file.replace('.raw', '_events.npz')
 				elif file_ext == 'aedat':
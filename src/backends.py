@@ -0,0 +1,28 @@
+import importlib.util
+
+# 可选的解码后端：python 是逐字解码的参考实现，numba 是JIT编译的状态机
+BACKENDS = ('auto', 'python', 'numba')
+
+
+def numba_available() -> bool:
+	"""是否安装了numba"""
+	return importlib.util.find_spec('numba') is not None
+
+
+def resolve_backend(backend: str = 'auto') -> str:
+	"""
+	确定实际使用的解码后端
+	
+	Args:
+		backend: 'auto'（安装了numba时用numba，否则用python）、'python' 或 'numba'
+		
+	Returns:
+		'python' 或 'numba'
+	"""
+	if backend not in BACKENDS:
+		raise ValueError(f"不支持的解码后端: {backend}。支持的后端: {', '.join(BACKENDS)}")
+	if backend == 'auto':
+		return 'numba' if numba_available() else 'python'
+	if backend == 'numba' and not numba_available():
+		raise ValueError("numba解码后端需要先安装numba (pip install numba)")
+	return backend
@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import argparse
+import numpy as np
+from typing import Dict, Tuple, List, Optional
+
+# 缓存目录格式的版本，格式改变时递增，旧的缓存自动失效
+CACHE_FORMAT_VERSION = 2
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'raw_event_converter')
+
+# 快速哈希时从文件头、中、尾各取的字节数
+FAST_HASH_SAMPLE_BYTES = 1 << 20
+
+# 崩溃进程遗留的临时目录超过这个时间（秒）后在淘汰时一并删除
+STALE_TMP_SECONDS = 3600
+
+_META_FILE = 'meta.json'
+_TABLES = ('events', 'trigger_events')
+
+
+def fast_file_hash(filename: str, sample_bytes: int = FAST_HASH_SAMPLE_BYTES) -> str:
+	"""对文件头、中、尾各取一段做哈希，用来区分大小和修改时间都相同的不同文件"""
+	size = os.path.getsize(filename)
+	digest = hashlib.blake2b(str(size).encode('ascii'), digest_size=16)
+	with open(filename, 'rb') as f:
+		for offset in sorted({0, max(size // 2 - sample_bytes // 2, 0), max(size - sample_bytes, 0)}):
+			f.seek(offset)
+			digest.update(f.read(sample_bytes))
+	return digest.hexdigest()
+
+
+class DecodeCache:
+	"""
+	解码结果的磁盘缓存
+
+	以文件身份（路径、大小、修改时间、可选的快速哈希）+ 解码器版本 + 解码选项为键，
+	每个条目是一个目录，事件和触发事件各保存为一个结构化数组的 .npy 文件，
+	读取时用 np.load(mmap_mode='r') 内存映射，直接得到与 read_evt3_events 相同dtype的数组，不发生拷贝。
+
+	多进程并发访问是安全的：条目先写入临时目录再原子地重命名，删除时也先重命名再删除，
+	其他进程只会看到完整的条目或者看不到条目。按最近访问时间做LRU淘汰，控制缓存总大小。
+	"""
+
+	def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: Optional[int] = None):
+		"""
+		初始化缓存
+
+		Args:
+			cache_dir: 缓存目录
+			max_bytes: 缓存总大小上限（None表示不限制）
+		"""
+		self.cache_dir = cache_dir
+		self.max_bytes = max_bytes
+		os.makedirs(cache_dir, exist_ok=True)
+
+	def make_key(self, filename: str, decoder: str, decoder_version: int, options: Dict,
+				 fast_hash: bool = False) -> str:
+		"""
+		生成缓存键
+
+		Args:
+			filename: 输入文件路径
+			decoder: 解码器名称
+			decoder_version: 解码器版本，解码逻辑改变时递增
+			options: 影响解码结果的选项（max_events、滤波参数等），需要能序列化为JSON
+			fast_hash: 是否额外计算文件内容的快速哈希
+		"""
+		stat = os.stat(filename)
+		identity = {
+			"cache_format": CACHE_FORMAT_VERSION,
+			"path": os.path.abspath(filename),
+			"size": stat.st_size,
+			"mtime_ns": stat.st_mtime_ns,
+			"fast_hash": fast_file_hash(filename) if fast_hash else None,
+			"decoder": decoder,
+			"decoder_version": decoder_version,
+			"options": options,
+		}
+		return hashlib.sha256(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+	def _entry_dir(self, key: str) -> str:
+		return os.path.join(self.cache_dir, key)
+
+	def load(self, key: str) -> Optional[Tuple[np.ndarray, np.ndarray, Dict]]:
+		"""
+		读取缓存条目
+
+		Returns:
+			(events, trigger_events, header_info)，事件数组是只读的内存映射结构化数组；未命中返回None
+		"""
+		entry_dir = self._entry_dir(key)
+		try:
+			with open(os.path.join(entry_dir, _META_FILE), 'r', encoding='utf-8') as f:
+				meta = json.load(f)
+			events, trigger_events = [np.load(os.path.join(entry_dir, f"{table}.npy"), mmap_mode='r') for table in _TABLES]
+			# 更新访问时间，用于LRU淘汰
+			os.utime(os.path.join(entry_dir, _META_FILE))
+		except (OSError, ValueError, KeyError, EOFError):
+			# 条目不存在、正在被删除或已损坏，都当作未命中
+			return None
+
+		print(f"命中解码缓存: {entry_dir}")
+		return events, trigger_events, meta["header"]
+
+	def store(self, key: str, events: np.ndarray, trigger_events: np.ndarray, header: Dict, source: str = ""):
+		"""
+		写入缓存条目（原子操作），写入后按大小上限淘汰旧条目
+
+		Args:
+			key: make_key 生成的缓存键
+			events: 事件结构化数组
+			trigger_events: 触发事件结构化数组
+			header: 头部信息字典
+			source: 输入文件路径，只用于显示
+		"""
+		entry_dir = self._entry_dir(key)
+		if os.path.exists(entry_dir):
+			return
+
+		tmp_dir = os.path.join(self.cache_dir, f".tmp-{uuid.uuid4().hex}")
+		os.makedirs(tmp_dir)
+		try:
+			for table, array in zip(_TABLES, (events, trigger_events)):
+				np.save(os.path.join(tmp_dir, f"{table}.npy"), np.ascontiguousarray(array))
+			meta = {
+				"source": os.path.abspath(source) if source else "",
+				"created": time.time(),
+				"header": {k: v if isinstance(v, (int, float)) else str(v) for k, v in header.items()},
+			}
+			with open(os.path.join(tmp_dir, _META_FILE), 'w', encoding='utf-8') as f:
+				json.dump(meta, f, ensure_ascii=False)
+			os.rename(tmp_dir, entry_dir)
+		except OSError:
+			# 其他进程已经写入了同一个条目
+			shutil.rmtree(tmp_dir, ignore_errors=True)
+			return
+
+		print(f"解码结果已缓存到: {entry_dir}")
+		if self.max_bytes is not None:
+			self.prune(self.max_bytes)
+
+	def entries(self) -> List[Dict]:
+		"""列出所有缓存条目，按最近访问时间从旧到新排序"""
+		result = []
+		for key in os.listdir(self.cache_dir):
+			entry_dir = self._entry_dir(key)
+			if key.startswith('.') or not os.path.isdir(entry_dir):
+				continue
+			try:
+				with open(os.path.join(entry_dir, _META_FILE), 'r', encoding='utf-8') as f:
+					meta = json.load(f)
+				last_access = os.path.getmtime(os.path.join(entry_dir, _META_FILE))
+				size = sum(os.path.getsize(os.path.join(entry_dir, name)) for name in os.listdir(entry_dir))
+			except (OSError, ValueError):
+				continue
+			result.append({"key": key, "source": meta.get("source", ""), "size": size, "last_access": last_access})
+		return sorted(result, key=lambda entry: entry["last_access"])
+
+	def remove(self, key: str) -> bool:
+		"""删除一个缓存条目：先原子地重命名，其他进程就不会再读到它"""
+		trash_dir = os.path.join(self.cache_dir, f".trash-{uuid.uuid4().hex}")
+		try:
+			os.rename(self._entry_dir(key), trash_dir)
+		except OSError:
+			return False
+		shutil.rmtree(trash_dir, ignore_errors=True)
+		return True
+
+	def prune(self, max_bytes: int) -> List[Dict]:
+		"""按LRU淘汰缓存条目，直到总大小不超过 max_bytes，返回被删除的条目"""
+		for name in os.listdir(self.cache_dir):
+			path = os.path.join(self.cache_dir, name)
+			try:
+				if name.startswith(('.tmp-', '.trash-')) and time.time() - os.path.getmtime(path) > STALE_TMP_SECONDS:
+					shutil.rmtree(path, ignore_errors=True)
+			except OSError:
+				continue
+
+		entries = self.entries()
+		total = sum(entry["size"] for entry in entries)
+		removed = []
+		for entry in entries:
+			if total <= max_bytes:
+				break
+			if self.remove(entry["key"]):
+				total -= entry["size"]
+				removed.append(entry)
+		return removed
+
+	def clear(self) -> List[Dict]:
+		"""删除所有缓存条目"""
+		return self.prune(0)
+
+
+def main():
+	"""命令行入口：python -m src.decode_cache {list,prune,clear}"""
+	parser = argparse.ArgumentParser(description='查看和清理解码缓存')
+	parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='缓存目录')
+	subparsers = parser.add_subparsers(dest='command', required=True)
+	subparsers.add_parser('list', help='列出缓存条目')
+	prune_parser = subparsers.add_parser('prune', help='按LRU淘汰缓存条目')
+	prune_parser.add_argument('--max-gb', type=float, required=True, help='淘汰后缓存总大小上限 (GB)')
+	subparsers.add_parser('clear', help='删除所有缓存条目')
+
+	args = parser.parse_args()
+	cache = DecodeCache(args.cache_dir)
+
+	if args.command == 'list':
+		entries = cache.entries()
+		for entry in entries:
+			last_access = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry["last_access"]))
+			print(f"{entry['key']}  {entry['size'] / 1e6:10.1f}MB  {last_access}  {entry['source']}")
+		print(f"共 {len(entries)} 个条目, {sum(e['size'] for e in entries) / 1e9:.2f}GB")
+	else:
+		removed = cache.prune(int(args.max_gb * 1e9)) if args.command == 'prune' else cache.clear()
+		print(f"删除 {len(removed)} 个条目, 释放 {sum(e['size'] for e in removed) / 1e9:.2f}GB")
+
+	return 0
+
+
+if __name__ == "__main__":
+	exit(main())
@@ -0,0 +1,176 @@
+import numpy as np
+from typing import Iterable, Iterator, List, Optional, Tuple
+from src.read_raw import TimestampUnwrapper
+
+# 像素时间戳表的初始值，保证与任何真实时间戳的差都足够大
+_NEVER = np.iinfo(np.int64).min // 2
+
+# 背景活动滤波考察的8邻域
+_NEIGHBORS = [(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dx != 0 or dy != 0]
+
+
+class EventFilter:
+	"""
+	事件滤波器基类：按块处理事件，状态在块之间保持
+
+	时间戳先按24位回绕展开（回绕状态也在块之间保持），子类拿到的是单调不减的时间。
+	"""
+
+	def __init__(self, width: int, height: int):
+		"""
+		初始化滤波器
+
+		Args:
+			width: 传感器宽度
+			height: 传感器高度
+		"""
+		self.width = width
+		self.height = height
+		self.num_input = 0
+		self.num_output = 0
+		self.unwrapper = TimestampUnwrapper()
+
+	def __call__(self, events: np.ndarray) -> np.ndarray:
+		"""过滤一块按时间排序的事件，返回保留的事件；空块原样返回，不改变状态"""
+		if len(events) == 0:
+			return events
+		if (events['x'].max() >= self.width or events['y'].max() >= self.height):
+			raise ValueError(f"事件坐标超出传感器范围 {self.width}x{self.height}")
+		kept = events[self.keep_mask(events, self.unwrapper(events['t']))]
+		self.num_input += len(events)
+		self.num_output += len(kept)
+		return kept
+
+	def keep_mask(self, events: np.ndarray, ts: np.ndarray) -> np.ndarray:
+		"""返回每个事件是否保留的布尔数组，ts 为展开回绕后的int64时间戳，由子类实现"""
+		raise NotImplementedError
+
+	def __str__(self) -> str:
+		removed = self.num_input - self.num_output
+		ratio = removed / self.num_input * 100 if self.num_input > 0 else 0.0
+		return f"{type(self).__name__}: 输入 {self.num_input} 个事件, 去除 {removed} 个 ({ratio:.1f}%)"
+
+
+class _PixelHistory:
+	"""
+	块内按像素索引的事件历史，用于向量化地查询"某像素在第i个事件之前最后一次事件的时间戳"
+
+	把 (像素, 块内下标) 编码成一个整数并排序，查询时用二分查找前驱，
+	块内找不到时回退到之前各块留下的像素时间戳表。
+	"""
+
+	def __init__(self, pixels: np.ndarray, ts: np.ndarray, last_t: np.ndarray):
+		self.n = len(pixels)
+		self.ts = ts
+		self.last_t = last_t
+		self.keys = np.sort(pixels * self.n + np.arange(self.n))
+
+	def previous(self, query_pixels: np.ndarray) -> np.ndarray:
+		"""每个事件之前（不含自身）query_pixels[i] 像素上最后一次事件的时间戳"""
+		pos = np.searchsorted(self.keys, query_pixels * self.n + np.arange(self.n)) - 1
+		found = pos >= 0
+		found[found] = self.keys[pos[found]] // self.n == query_pixels[found]
+		return np.where(found, self.ts[self.keys[pos] % self.n], self.last_t[query_pixels])
+
+	def update_last_t(self):
+		"""把本块每个像素最后一次事件的时间戳写回像素时间戳表"""
+		pixels = self.keys // self.n
+		is_last = np.append(pixels[1:] != pixels[:-1], True)
+		self.last_t[pixels[is_last]] = self.ts[self.keys[is_last] % self.n]
+
+
+class BackgroundActivityFilter(EventFilter):
+	"""背景活动滤波：8邻域内在 dt_us 微秒之内没有其他事件的孤立事件被认为是噪声"""
+
+	def __init__(self, width: int, height: int, dt_us: int):
+		super().__init__(width, height)
+		self.dt_us = dt_us
+		# 每个像素最后一次事件的时间戳（包括被滤掉的事件）
+		self.last_t = np.full(width * height, _NEVER, dtype=np.int64)
+
+	def keep_mask(self, events: np.ndarray, ts: np.ndarray) -> np.ndarray:
+		xs = events['x'].astype(np.int64)
+		ys = events['y'].astype(np.int64)
+		history = _PixelHistory(ys * self.width + xs, ts, self.last_t)
+
+		keep = np.zeros(len(events), dtype=bool)
+		for dx, dy in _NEIGHBORS:
+			nx = xs + dx
+			ny = ys + dy
+			inside = (nx >= 0) & (nx < self.width) & (ny >= 0) & (ny < self.height)
+			neighbor = np.where(inside, ny * self.width + nx, 0)
+			keep |= inside & (ts - history.previous(neighbor) <= self.dt_us)
+
+		history.update_last_t()
+		return keep
+
+
+class RefractoryFilter(EventFilter):
+	"""不应期滤波：同一像素上距离上一次事件不足 period_us 微秒的事件被去除"""
+
+	def __init__(self, width: int, height: int, period_us: int):
+		super().__init__(width, height)
+		self.period_us = period_us
+		self.last_t = np.full(width * height, _NEVER, dtype=np.int64)
+
+	def keep_mask(self, events: np.ndarray, ts: np.ndarray) -> np.ndarray:
+		pixels = events['y'].astype(np.int64) * self.width + events['x'].astype(np.int64)
+		history = _PixelHistory(pixels, ts, self.last_t)
+		keep = ts - history.previous(pixels) >= self.period_us
+		history.update_last_t()
+		return keep
+
+
+class HotPixelFilter(EventFilter):
+	"""热像素屏蔽：去除落在热像素掩码上的事件"""
+
+	def __init__(self, hot_mask: np.ndarray):
+		"""
+		Args:
+			hot_mask: (height, width) 布尔数组，True表示热像素
+		"""
+		height, width = hot_mask.shape
+		super().__init__(width, height)
+		self.hot_mask = hot_mask
+
+	def keep_mask(self, events: np.ndarray, ts: np.ndarray) -> np.ndarray:
+		return ~self.hot_mask[events['y'], events['x']]
+
+
+def compute_pixel_event_rate(events: np.ndarray, width: int, height: int) -> np.ndarray:
+	"""
+	统计每个像素的事件率（录制时长按24位回绕展开后的时间计算）
+
+	Returns:
+		(height, width) 数组，单位为 事件/秒
+	"""
+	counts = np.bincount(events['y'].astype(np.int64) * width + events['x'], minlength=width * height)
+	ts = TimestampUnwrapper()(events['t'])
+	duration_s = (ts.max() - ts.min()) * 1e-6 if len(events) > 1 else 0.0
+	return (counts / duration_s if duration_s > 0 else counts.astype(np.float64)).reshape(height, width)
+
+
+def hot_pixel_mask(pixel_rate: np.ndarray, threshold: Optional[float] = None, num_sigma: float = 5.0) -> np.ndarray:
+	"""
+	根据像素事件率得到热像素掩码
+
+	Args:
+		pixel_rate: (height, width) 像素事件率
+		threshold: 事件率阈值（None表示用有事件像素的 均值 + num_sigma * 标准差）
+		num_sigma: 自动阈值的标准差倍数
+
+	Returns:
+		(height, width) 布尔数组，True表示热像素
+	"""
+	if threshold is None:
+		active = pixel_rate[pixel_rate > 0]
+		threshold = active.mean() + num_sigma * active.std() if len(active) > 0 else np.inf
+	return pixel_rate > threshold
+
+
+def apply_filters(chunks: Iterable[Tuple[np.ndarray, np.ndarray]], filters: List[EventFilter]) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+	"""依次把每块事件通过所有滤波器，触发事件原样保留"""
+	for events, trigger_events in chunks:
+		for event_filter in filters:
+			events = event_filter(events)
+		yield events, trigger_events
@@ -0,0 +1,204 @@
+import heapq
+import json
+import argparse
+import numpy as np
+from typing import Dict, Tuple, List, Optional, Iterator
+from src.read_raw import read_evt3_header, iter_evt3_chunks, scan_evt3_triggers, TimestampUnwrapper, CHUNK_BYTES, EVENT_DTYPE, TRIGGER_EVENT_DTYPE
+from src.write_formats import save_event_chunks_to_arrow
+from src.backends import BACKENDS
+
+
+def trigger_edge_times(trigger_events: np.ndarray, trigger_id: int = 0, value: int = 1) -> np.ndarray:
+	"""取出指定通道、指定边沿（1: 上升沿, 0: 下降沿）的触发时间戳"""
+	mask = (trigger_events['id'] == trigger_id) & (trigger_events['value'] == value)
+	return trigger_events['t'][mask].astype(np.float64)
+
+
+def _match_edges(ref_times: np.ndarray, times: np.ndarray, tolerance_us: float) -> Tuple[np.ndarray, np.ndarray]:
+	"""为每个times找最近的ref_times，返回误差在容差内的配对下标"""
+	right = np.clip(np.searchsorted(ref_times, times), 1, len(ref_times) - 1) if len(ref_times) > 1 else np.zeros(len(times), dtype=np.int64)
+	left = np.maximum(right - 1, 0)
+	nearest = np.where(np.abs(ref_times[left] - times) <= np.abs(ref_times[right] - times), left, right)
+	matched = np.abs(ref_times[nearest] - times) <= tolerance_us
+	return nearest[matched], np.flatnonzero(matched)
+
+
+def estimate_clock_model(ref_times: np.ndarray, times: np.ndarray, tolerance_us: Optional[float] = None,
+						 num_candidates: int = 8) -> Tuple[float, float]:
+	"""
+	根据两路相机记录到的同一组触发边沿，估计时钟模型 ref_t = scale * t + offset
+
+	先用前几个边沿两两相减得到候选偏移，选配对数量最多的作为初值，
+	再用最近邻配对 + 最小二乘迭代拟合偏移和漂移。
+
+	Args:
+		ref_times: 参考相机的触发边沿时间戳（微秒，升序）
+		times: 待同步相机的触发边沿时间戳（微秒，升序）
+		tolerance_us: 配对容差（None表示取参考边沿间隔中位数的1/4）
+		num_candidates: 用来生成候选偏移的前若干个边沿数量
+
+	Returns:
+		(scale, offset)
+	"""
+	if len(ref_times) == 0 or len(times) == 0:
+		print("警告: 缺少触发边沿，无法估计时钟偏移，按无偏移处理")
+		return 1.0, 0.0
+
+	if tolerance_us is None:
+		tolerance_us = np.median(np.diff(ref_times)) / 4 if len(ref_times) > 1 else np.inf
+
+	# 候选偏移：前几个边沿的所有两两差值
+	candidates = (ref_times[:num_candidates, None] - times[None, :num_candidates]).ravel()
+	match_counts = [len(_match_edges(ref_times, times + c, tolerance_us)[0]) for c in candidates]
+	scale, offset = 1.0, float(candidates[int(np.argmax(match_counts))])
+
+	for _ in range(3):
+		ref_idx, idx = _match_edges(ref_times, scale * times + offset, tolerance_us)
+		if len(idx) >= 2 and times[idx].max() > times[idx].min():
+			scale, offset = np.polyfit(times[idx], ref_times[ref_idx], 1)
+		elif len(idx) == 1:
+			offset = float(ref_times[ref_idx[0]] - scale * times[idx[0]])
+
+	return float(scale), float(offset)
+
+
+def _map_timestamps(ts: np.ndarray, scale: float, offset: float) -> np.ndarray:
+	"""把时间戳映射到参考时钟，早于参考时钟零点的部分截断为0"""
+	return np.clip(np.rint(scale * ts.astype(np.float64) + offset), 0, None).astype(np.uint64)
+
+
+def _with_camera(array: np.ndarray, ts: np.ndarray, camera: int, scale: float, offset: float) -> np.ndarray:
+	"""用展开回绕后的时间戳 ts 映射时间，并增加camera列"""
+	dtype = np.dtype(array.dtype.descr + [('camera', np.uint8)])
+	result = np.empty(len(array), dtype=dtype)
+	for name in array.dtype.names:
+		result[name] = array[name]
+	result['t'] = _map_timestamps(ts, scale, offset)
+	result['camera'] = camera
+	return result
+
+
+def _concat_sorted(parts: List[np.ndarray]) -> np.ndarray:
+	"""合并若干个各自有序的数组，时间戳相同时按相机编号排序"""
+	merged = np.concatenate(parts)
+	return merged[np.argsort(merged['t'], kind='stable')]
+
+
+def merge_event_streams(streams: List[Iterator[Tuple[np.ndarray, np.ndarray]]],
+						clock_models: List[Tuple[float, float]]) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+	"""
+	多路时间有序事件流的k路归并（单遍扫描，内存只与路数和块大小有关）
+
+	每一路只缓存一个块。用堆维护各路缓存中最后一个时间戳，堆顶即当前水位线：
+	所有路中不晚于水位线的事件都已经到齐，可以直接输出；随后堆顶那一路的缓存已经清空，再读入它的下一块。
+	每一路的时间戳先按24位回绕展开（TimestampUnwrapper，状态在块之间保持），展开后必须单调不减，否则报错。
+
+	Args:
+		streams: 每路相机的 (events, trigger_events) 分块迭代器
+		clock_models: 每路相机的 (scale, offset)，把时间戳映射到参考时钟
+
+	Returns:
+		依次产生带camera列、按时间排序的 (events, trigger_events)
+	"""
+	pending_events: Dict[int, np.ndarray] = {}
+	pending_triggers: Dict[int, np.ndarray] = {}
+	unwrappers = [TimestampUnwrapper() for _ in streams]
+	heap = []
+
+	def refill(camera: int):
+		"""读入下一个非空块，并把该路的块末时间压入堆"""
+		for events, trigger_events in streams[camera]:
+			if len(events) == 0 and len(trigger_events) == 0:
+				continue
+			unwrapper = unwrappers[camera]
+			ts = unwrapper.unwrap(events['t'])
+			trigger_ts = unwrapper.unwrap(trigger_events['t'])
+			if np.any(np.diff(ts, prepend=unwrapper.last_t) < 0) or np.any(np.diff(trigger_ts, prepend=unwrapper.last_t) < 0):
+				raise ValueError(f"相机 {camera} 的时间戳未排序（按24位回绕计），无法归并")
+			unwrapper.advance(events['t'], ts)
+			unwrapper.advance(trigger_events['t'], trigger_ts)
+
+			scale, offset = clock_models[camera]
+			events = _with_camera(events, ts, camera, scale, offset)
+			trigger_events = _with_camera(trigger_events, trigger_ts, camera, scale, offset)
+			pending_events[camera] = np.concatenate((pending_events[camera], events))
+			pending_triggers[camera] = np.concatenate((pending_triggers[camera], trigger_events))
+			last_t = max(events['t'][-1] if len(events) else 0, trigger_events['t'][-1] if len(trigger_events) else 0)
+			heapq.heappush(heap, (int(last_t), camera))
+			return
+
+	for camera, (scale, offset) in enumerate(clock_models):
+		pending_events[camera] = _with_camera(np.array([], dtype=EVENT_DTYPE), np.array([]), camera, scale, offset)
+		pending_triggers[camera] = _with_camera(np.array([], dtype=TRIGGER_EVENT_DTYPE), np.array([]), camera, scale, offset)
+		refill(camera)
+
+	while heap:
+		watermark, camera = heapq.heappop(heap)
+
+		event_parts = []
+		trigger_parts = []
+		for cam in pending_events:
+			split = np.searchsorted(pending_events[cam]['t'], watermark, side='right')
+			event_parts.append(pending_events[cam][:split])
+			pending_events[cam] = pending_events[cam][split:]
+			split = np.searchsorted(pending_triggers[cam]['t'], watermark, side='right')
+			trigger_parts.append(pending_triggers[cam][:split])
+			pending_triggers[cam] = pending_triggers[cam][split:]
+
+		yield _concat_sorted(event_parts), _concat_sorted(trigger_parts)
+
+		refill(camera)
+
+	# 每一路展开后单调时，最后一次输出的水位线不早于任何缓存中的事件，缓存必然已经清空
+	num_pending = sum(len(pending) for pending in pending_events.values()) + sum(len(pending) for pending in pending_triggers.values())
+	if num_pending > 0:
+		raise RuntimeError(f"归并结束时还有 {num_pending} 个事件没有输出")
+
+
+def main():
+	"""命令行入口：python -m src.merge_events cam0.raw cam1.raw ... --output merged.arrow"""
+	parser = argparse.ArgumentParser(description='按触发信号同步并合并多路RAW文件')
+	parser.add_argument('input_files', nargs='+', help='输入RAW文件路径，第一个文件作为参考时钟')
+	parser.add_argument('--output', required=True, help='输出Arrow IPC文件路径 (触发事件保存到 *_trigger.arrow)')
+	parser.add_argument('--sync-trigger-id', type=int, default=0, help='用于同步的触发通道ID')
+	parser.add_argument('--sync-edge', type=int, choices=[0, 1], default=1, help='用于同步的触发边沿 (1: 上升沿, 0: 下降沿)')
+	parser.add_argument('--tolerance-us', type=float, help='触发边沿配对容差（微秒）')
+	parser.add_argument('--backend', choices=BACKENDS, default='auto', help='解码后端')
+	parser.add_argument('--chunk-bytes', type=int, default=CHUNK_BYTES, help='每路每次读取的字节数')
+
+	args = parser.parse_args()
+
+	try:
+		# 第一遍：只扫描触发事件，估计每路相机的时钟模型
+		edges = []
+		for filename in args.input_files:
+			trigger_events = scan_evt3_triggers(filename, args.chunk_bytes)
+			edges.append(trigger_edge_times(trigger_events, args.sync_trigger_id, args.sync_edge))
+			print(f"{filename}: {len(edges[-1])} 个同步边沿")
+
+		clock_models = [estimate_clock_model(edges[0], e, args.tolerance_us) for e in edges]
+		for camera, (filename, (scale, offset)) in enumerate(zip(args.input_files, clock_models)):
+			print(f"相机 {camera} ({filename}): 漂移 {(scale - 1) * 1e6:.3f} ppm, 偏移 {offset:.1f} 微秒")
+
+		# 第二遍：k路归并写出
+		header, _ = read_evt3_header(args.input_files[0])
+		header = {
+			"format": "MERGED",
+			"width": header["width"],
+			"height": header["height"],
+			"sources": json.dumps(args.input_files),
+			"clock_models": json.dumps(clock_models),
+			"header_text": "\n".join(read_evt3_header(f)[0]["header_text"] for f in args.input_files),
+		}
+		streams = [iter_evt3_chunks(f, chunk_bytes=args.chunk_bytes, backend=args.backend) for f in args.input_files]
+		save_event_chunks_to_arrow(merge_event_streams(streams, clock_models), header, args.output)
+
+	except Exception as e:
+		print(f"错误: {e}")
+		return 1
+
+	return 0
+
+
+if __name__ == "__main__":
+	exit(main())
@@ -0,0 +1,118 @@
+import numpy as np
+from numba import njit
+
+# 编译结果缓存在 __pycache__ 中（cache=True），之后运行不需要重新JIT编译
+
+
+@njit(cache=True)
+def _popcount(value):
+	count = 0
+	while value:
+		value &= value - 1
+		count += 1
+	return count
+
+
+@njit(cache=True)
+def evt3_count(words):
+	"""
+	第一遍：统计一块EVT3字会产生的事件数和触发事件数（不需要解码器状态）
+	"""
+	num_events = 0
+	num_triggers = 0
+	for i in range(len(words)):
+		word = np.int64(words[i])
+		event_type = (word >> 12) & 0xF
+		if event_type == 0x2:
+			num_events += 1
+		elif event_type == 0x4:
+			num_events += _popcount(word & 0xFFF)
+		elif event_type == 0x5:
+			num_events += _popcount(word & 0xFF)
+		elif event_type == 0xA:
+			num_triggers += 1
+	return num_events, num_triggers
+
+
+@njit(cache=True)
+def evt3_fill(words, state, max_events, xs, ys, ts, ps, trigger_ts, trigger_ids, trigger_values, type_counts):
+	"""
+	第二遍：按与 EVT3Decoder.decode_word 相同的状态机解码，填入预先分配好的输出数组
+
+	Args:
+		words: uint16 EVT3字
+		state: int64数组 [time_high, time_low, current_y, vect_base_x, vect_base_polarity]，原地更新
+		max_events: 最多解码的事件数，达到后在当前字之后停止
+		xs, ys, ts, ps: 事件输出数组
+		trigger_ts, trigger_ids, trigger_values: 触发事件输出数组
+		type_counts: 长度16的int64数组，累加各类型字的数量
+
+	Returns:
+		(num_events, num_triggers)
+	"""
+	time_high = state[0]
+	time_low = state[1]
+	current_y = state[2]
+	vect_base_x = state[3]
+	vect_base_polarity = state[4]
+	num_events = 0
+	num_triggers = 0
+
+	for i in range(len(words)):
+		word = np.int64(words[i])
+		event_type = (word >> 12) & 0xF
+		type_counts[event_type] += 1
+
+		if event_type == 0x0:
+			current_y = word & 0x7FF
+		elif event_type == 0x2:
+			xs[num_events] = word & 0x7FF
+			ys[num_events] = current_y
+			ts[num_events] = (time_high << 12) | time_low
+			ps[num_events] = (word >> 11) & 0x1
+			num_events += 1
+		elif event_type == 0x3:
+			vect_base_x = word & 0x7FF
+			vect_base_polarity = (word >> 11) & 0x1
+		elif event_type == 0x4 or event_type == 0x5:
+			width = 12 if event_type == 0x4 else 8
+			for bit in range(width):
+				if (word >> bit) & 0x1 and num_events < max_events:
+					xs[num_events] = vect_base_x + bit
+					ys[num_events] = current_y
+					ts[num_events] = (time_high << 12) | time_low
+					ps[num_events] = vect_base_polarity
+					num_events += 1
+			vect_base_x += width
+		elif event_type == 0x6:
+			time_low = word & 0xFFF
+		elif event_type == 0x8:
+			time_high = word & 0xFFF
+		elif event_type == 0xA:
+			trigger_ts[num_triggers] = (time_high << 12) | time_low
+			trigger_ids[num_triggers] = (word >> 8) & 0xF
+			trigger_values[num_triggers] = word & 0x1
+			num_triggers += 1
+
+		if num_events >= max_events:
+			break
+
+	state[0] = time_high
+	state[1] = time_low
+	state[2] = current_y
+	state[3] = vect_base_x
+	state[4] = vect_base_polarity
+	return num_events, num_triggers
+
+
+@njit(cache=True)
+def aedat3_fill(words, xs, ys, ts, ps):
+	"""
+	解码AEDAT3极性事件块：words为uint32数组，每个事件两个字 (data, timestamp)
+	"""
+	for i in range(len(xs)):
+		data = np.int64(words[2 * i])
+		xs[i] = (data >> 17) & 0x1FFF
+		ys[i] = (data >> 2) & 0x1FFF
+		ps[i] = (data >> 1) & 0x1
+		ts[i] = words[2 * i + 1]
@@ -1,7 +1,12 @@
 import struct
 import numpy as np
-from typing import Dict, Tuple, List, Optional
+from typing import Dict, Tuple, List, Optional, Iterator
 from dataclasses import dataclass
+from src.read_raw import EVENT_DTYPE, TRIGGER_EVENT_DTYPE
+from src.backends import resolve_backend
+
+# 解码器版本，解码结果改变时递增（用于解码缓存）
+DECODER_VERSION = 1
 
 @dataclass
 class Event:
@@ -11,21 +16,16 @@ class Event:
 	t: int  # 时间戳（微秒）
 	p: int  # 极性 (0 or 1)
 
-def read_aedat3_events(filename: str, max_events: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, Dict[str, str]]:
+def read_aedat3_header(filename: str) -> Tuple[Dict[str, str], int]:
 	"""
-	读取AEDAT3格式的事件数据
+	读取AEDAT3文件的ASCII头部
 	
 	Args:
 		filename: AEDAT3文件路径
-		max_events: 最大读取事件数量（None表示读取全部）
 		
 	Returns:
-		(events_array, trigger_events_array, header_info)
-		events_array: Nx4的numpy数组，列为[x, y, t, p]
-		trigger_events_array: Nx3的numpy数组，列为[t, id, value] (目前为空数组，AEDAT3格式没有触发事件)
-		header_info: 头部信息字典
+		(header_dict, data_start_position)
 	"""
-	events = []
 	header = {
 		"format": "AEDAT3",
 		"header_text": f"AEDAT3 format file: {filename}\n% Data format: Polarity Events\n% end"
@@ -48,18 +48,82 @@ def read_aedat3_events(filename: str, max_events: Optional[int] = None) -> Tuple
 				# 遇到非ASCII字符，可能是二进制数据开始了
 				f.seek(f.tell() - len(line))  # 回退
 				break
+		data_start = f.tell()
+	
+	header["header_text"] = text_header
+	
+	if "#Source 1: DVS128" in text_header:
+		header["width"] = 128
+		header["height"] = 128
+	
+	return header, data_start
+
+
+def decode_packet_python(events_data: bytes, event_number: int) -> np.ndarray:
+	"""
+	逐个解析AEDAT3极性事件块中的前 event_number 个事件（参考实现）
+	
+	Args:
+		events_data: 事件块数据，每个事件8字节 (4字节data + 4字节timestamp)
+		event_number: 要解析的事件数量
+		
+	Returns:
+		events_array: 结构化数组，列为[x, y, t, p]
+	"""
+	events = []
+	# 解析每个事件
+	for i in range(event_number):
+		offset = i * 8
+		data, timestamp = struct.unpack('<LL', events_data[offset:offset+8])
 		
-		header["header_text"] = text_header
+		# 从data字段提取x, y, polarity
+		x = (data >> 17) & 0x00001FFF
+		y = (data >> 2) & 0x00001FFF
+		polarity = (data >> 1) & 0x00000001
 		
-		if "#Source 1: DVS128" in text_header:
-			header["width"] = 128
-			header["height"] = 128
+		# 创建事件
+		event = Event(
+			x=x,
+			y=y,
+			t=timestamp,  # AEDAT3中timestamp直接使用，单位为微秒
+			p=polarity
+		)
+		events.append(event)
+	
+	return np.array([(e.x, e.y, e.t, e.p) for e in events], dtype=EVENT_DTYPE)
+
+
+def decode_packet_numba(events_data: bytes, event_number: int) -> np.ndarray:
+	"""用numba编译的内核解析AEDAT3极性事件块，结果与 decode_packet_python 相同"""
+	from src.numba_kernels import aedat3_fill
+	
+	words = np.frombuffer(events_data, dtype='<u4', count=event_number * 2)
+	events = np.empty(event_number, dtype=EVENT_DTYPE)
+	aedat3_fill(words, events['x'], events['y'], events['t'], events['p'])
+	return events
+
 
-		print(f"ASCII头部读取完成，二进制数据开始位置: {f.tell()}")
+def iter_aedat3_chunks(filename: str, max_events: Optional[int] = None, backend: str = 'auto') -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+	"""
+	逐个事件块（packet）读取AEDAT3格式的事件数据
+	
+	Args:
+		filename: AEDAT3文件路径
+		max_events: 最大读取事件数量（None表示读取全部）
+		backend: 解码后端，'auto'、'python' 或 'numba'（见 src.backends）
 		
+	Returns:
+		依次产生 (events_array, trigger_events_array)，AEDAT3格式没有触发事件，trigger_events_array始终为空
+	"""
+	_, data_start = read_aedat3_header(filename)
+	decode_packet = decode_packet_numba if resolve_backend(backend) == 'numba' else decode_packet_python
+	empty_triggers = np.array([], dtype=TRIGGER_EVENT_DTYPE)
+	
+	with open(filename, 'rb') as f:
+		f.seek(data_start)
 		event_count = 0
 		
-		while True:
+		while max_events is None or event_count < max_events:
 			# 读取头部结构 (28 bytes: 2*uint16_t + 6*uint32_t)
 			header_data = f.read(28)
 			if len(header_data) < 28:
@@ -78,50 +142,43 @@ def read_aedat3_events(filename: str, max_events: Optional[int] = None) -> Tuple
 				if len(events_data) < events_data_size:
 					break
 				
-				# 解析每个事件
-				for i in range(event_number):
-					offset = i * 8
-					data, timestamp = struct.unpack('<LL', events_data[offset:offset+8])
-					
-					# 从data字段提取x, y, polarity
-					x = (data >> 17) & 0x00001FFF
-					y = (data >> 2) & 0x00001FFF
-					polarity = (data >> 1) & 0x00000001
-					
-					# 创建事件
-					event = Event(
-						x=x,
-						y=y,
-						t=timestamp,  # AEDAT3中timestamp直接使用，单位为微秒
-						p=polarity
-					)
-					events.append(event)
-					event_count += 1
-					
-					# 检查是否达到最大事件数
-					if max_events is not None and event_count >= max_events:
-						break
-				
-				if max_events is not None and event_count >= max_events:
-					break
+				# 检查是否达到最大事件数
+				if max_events is not None:
+					event_number = min(event_number, max_events - event_count)
+				events = decode_packet(events_data, event_number)
+				event_count += len(events)
+				yield events, empty_triggers
 			
 			# 显示进度
 			if event_count % 100000 == 0 and event_count > 0:
 				print(f"已解码 {event_count} 个事件")
+
+
+def read_aedat3_events(filename: str, max_events: Optional[int] = None, backend: str = 'auto') -> Tuple[np.ndarray, np.ndarray, Dict[str, str]]:
+	"""
+	读取AEDAT3格式的事件数据
+	
+	Args:
+		filename: AEDAT3文件路径
+		max_events: 最大读取事件数量（None表示读取全部）
+		backend: 解码后端，'auto'、'python' 或 'numba'
+		
+	Returns:
+		(events_array, trigger_events_array, header_info)
+		events_array: Nx4的numpy数组，列为[x, y, t, p]
+		trigger_events_array: Nx3的numpy数组，列为[t, id, value] (目前为空数组，AEDAT3格式没有触发事件)
+		header_info: 头部信息字典
+	"""
+	header, data_start = read_aedat3_header(filename)
+	print(f"ASCII头部读取完成，二进制数据开始位置: {data_start}")
+	print(f"解码后端: {resolve_backend(backend)}")
 	
-	print(f"总共解码 {len(events)} 个事件")
+	chunks = [events for events, _ in iter_aedat3_chunks(filename, max_events, backend)]
+	events_array = np.concatenate(chunks) if chunks else np.array([], dtype=EVENT_DTYPE)
 	
-	# 转换为numpy数组
-	if events:
-		events_array = np.array([(e.x, e.y, e.t, e.p) for e in events], 
-							   dtype=[('x', np.uint16), ('y', np.uint16), 
-									 ('t', np.uint64), ('p', np.uint8)])
-	else:
-		events_array = np.array([], dtype=[('x', np.uint16), ('y', np.uint16), 
-										  ('t', np.uint64), ('p', np.uint8)])
+	print(f"总共解码 {len(events_array)} 个事件")
 	
 	# AEDAT3格式目前不包含触发事件，返回空数组
-	trigger_events_array = np.array([], dtype=[('t', np.uint64), ('id', np.uint8), 
-											   ('value', np.uint8)])
+	trigger_events_array = np.array([], dtype=TRIGGER_EVENT_DTYPE)
 	
 	return events_array, trigger_events_array, header
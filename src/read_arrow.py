@@ -0,0 +1,75 @@
+import numpy as np
+from typing import Dict, Iterator, Tuple
+from src.write_formats import trigger_events_filename
+
+
+def _header_from_schema(schema) -> Dict[str, str]:
+	"""从Arrow schema metadata恢复头部信息字典"""
+	header = {}
+	for key, value in (schema.metadata or {}).items():
+		header[key.decode('utf-8')] = value.decode('utf-8')
+	for key in ('width', 'height'):
+		if key in header:
+			header[key] = int(header[key])
+	return header
+
+
+def _batch_columns(batch) -> Dict[str, np.ndarray]:
+	"""把record batch的各列零拷贝地转换为numpy数组"""
+	return {name: batch.column(i).to_numpy(zero_copy_only=True) for i, name in enumerate(batch.schema.names)}
+
+
+def iter_arrow_batches(filename: str) -> Iterator[Dict[str, np.ndarray]]:
+	"""
+	逐个record batch内存映射读取Arrow IPC文件
+	
+	Args:
+		filename: Arrow IPC文件路径
+		
+	Returns:
+		依次产生 {列名: numpy数组} 字典，数组直接引用内存映射的文件内容，不发生拷贝
+	"""
+	import pyarrow as pa
+
+	reader = pa.ipc.open_file(pa.memory_map(filename, 'r'))
+	for i in range(reader.num_record_batches):
+		yield _batch_columns(reader.get_batch(i))
+
+
+def _read_arrow_columns(filename: str) -> Tuple[Dict[str, np.ndarray], Dict[str, str]]:
+	"""读取整个Arrow IPC文件的所有列，只有一个record batch时零拷贝，多个batch时拼接（拷贝）"""
+	import pyarrow as pa
+
+	reader = pa.ipc.open_file(pa.memory_map(filename, 'r'))
+	schema = reader.schema
+	if reader.num_record_batches == 1:
+		columns = _batch_columns(reader.get_batch(0))
+	elif reader.num_record_batches > 1:
+		batches = [_batch_columns(reader.get_batch(i)) for i in range(reader.num_record_batches)]
+		columns = {name: np.concatenate([batch[name] for batch in batches]) for name in schema.names}
+	else:
+		columns = {field.name: np.array([], dtype=field.type.to_pandas_dtype()) for field in schema}
+	return columns, _header_from_schema(schema)
+
+
+def read_arrow_events(filename: str) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray], Dict[str, str]]:
+	"""
+	读取 save_events_to_arrow 写出的Arrow IPC文件
+	
+	save_events_to_arrow 写出的文件只有一个record batch，各列直接内存映射，不发生拷贝。
+	分块写出的文件（save_event_chunks_to_arrow、多相机合并）有多个record batch，
+	这里会把它们拼接成连续数组，需要拷贝一次；不想拷贝时用 iter_arrow_batches 逐个batch读取。
+	
+	Args:
+		filename: 事件Arrow IPC文件路径（触发事件从 trigger_events_filename(filename) 读取）
+		
+	Returns:
+		(events_columns, trigger_events_columns, header_info)
+		events_columns: {'x', 'y', 't', 'p'} 列字典，只有一个record batch时每列是内存映射的numpy数组
+		trigger_events_columns: {'t', 'id', 'value'} 列字典
+		header_info: 头部信息字典
+	"""
+	events, header = _read_arrow_columns(filename)
+	trigger_events, _ = _read_arrow_columns(trigger_events_filename(filename))
+	print(f"从 {filename} 读取 {len(events['t'])} 个事件, {len(trigger_events['t'])} 个触发事件")
+	return events, trigger_events, header
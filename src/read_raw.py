@@ -1,7 +1,53 @@
-import struct
 import numpy as np
-from typing import Dict, Tuple, List, Optional
+from typing import Dict, Tuple, List, Optional, Iterator
 from dataclasses import dataclass
+from src.backends import resolve_backend
+
+EVENT_DTYPE = np.dtype([('x', np.uint16), ('y', np.uint16), ('t', np.uint64), ('p', np.uint8)])
+TRIGGER_EVENT_DTYPE = np.dtype([('t', np.uint64), ('id', np.uint8), ('value', np.uint8)])
+
+# 分块读取时每块的字节数
+CHUNK_BYTES = 1 << 20
+
+# 解码器版本，解码结果改变时递增（用于解码缓存）
+DECODER_VERSION = 1
+
+# EVT3时间戳只有24位（微秒），约16.7秒回绕一次
+TIMESTAMP_PERIOD = 1 << 24
+
+
+class TimestampUnwrapper:
+	"""
+	把按24位回绕的时间戳展开成单调不减的时间，状态在块之间保持
+
+	时间戳比上一个下降超过半个周期时视为一次回绕；本来就单调的时间戳原样返回。
+	同一块里的多路时间戳（例如事件和触发事件）都用 unwrap 以上一块结束时的状态为起点展开，
+	再用 advance 更新状态。
+	"""
+
+	def __init__(self, period: int = TIMESTAMP_PERIOD):
+		self.period = period
+		self.last_raw_t = 0  # 上一个时间戳（展开前）
+		self.last_t = 0      # 上一个时间戳（展开后）
+
+	def unwrap(self, ts: np.ndarray) -> np.ndarray:
+		"""展开一路时间戳（不更新状态），返回int64数组"""
+		ts = ts.astype(np.int64)
+		prev = np.concatenate(([self.last_raw_t], ts[:-1]))
+		wraps = np.cumsum(prev - ts > self.period // 2)
+		return ts + (self.last_t - self.last_raw_t) + wraps * self.period
+
+	def advance(self, raw_ts: np.ndarray, ts: np.ndarray):
+		"""用一路时间戳展开前后的值更新状态，多路时取最晚的一个"""
+		if len(ts) > 0 and ts[-1] >= self.last_t:
+			self.last_raw_t = int(raw_ts[-1])
+			self.last_t = int(ts[-1])
+
+	def __call__(self, ts: np.ndarray) -> np.ndarray:
+		"""展开一路时间戳并更新状态"""
+		unwrapped = self.unwrap(ts)
+		self.advance(ts, unwrapped)
+		return unwrapped
 
 @dataclass
 class Event:
@@ -223,13 +269,14 @@ def read_raw_header(filename: str) -> Tuple[Dict[str, str], int]:
 					key, value = parts
 					header[key] = value
 				elif len(parts) == 1 and parts[0] == 'end':
-					# 遇到end标记，头部结束
+					# 遇到end标记，头部结束，end这一行本身也属于头部
+					line = b""
 					break
 			elif not line_str.startswith('%'):
 				# 不以%开头，说明头部结束
 				break
 				
-		# 记录数据开始位置
+		# 记录数据开始位置（回退已读入的非头部行）
 		data_start = f.tell() - len(line)
 	
 	header["header_text"] = header_text.strip()
@@ -273,21 +320,16 @@ def parse_format_from_header(header: Dict) -> Tuple[str, int, int]:
 	return encoding_format, height, width
 
 
-def read_evt3_events(filename: str, max_events: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, Dict[str, str]]:
+def read_evt3_header(filename: str) -> Tuple[Dict[str, str], int]:
 	"""
-	读取EVT3格式的事件数据
+	读取并检查EVT3格式RAW文件的头部信息
 	
 	Args:
 		filename: RAW文件路径
-		max_events: 最大读取事件数量（None表示读取全部）
 		
 	Returns:
-		(events_array, trigger_events_array, header_info)
-		events_array: Nx4的numpy数组，列为[x, y, t, p]
-		trigger_events_array: Nx3的numpy数组，列为[t, id, value]
-		header_info: 头部信息字典
+		(header_dict, data_start_position)，header_dict中补充了width和height
 	"""
-	# 读取头部信息
 	header, data_start = read_raw_header(filename)
 	
 	# 解析格式信息
@@ -301,67 +343,204 @@ def read_evt3_events(filename: str, max_events: Optional[int] = None) -> Tuple[n
 	if not encoding_format.startswith('EVT3'):
 		raise ValueError(f"不支持的编码格式: {encoding_format}")
 	
-	print(f"文件格式: {encoding_format}")
-	print(f"分辨率: {width}x{height}")
-	print(f"数据开始位置: {data_start}")
-	
-	# 创建解码器
-	decoder = EVT3Decoder(width, height)
+	return header, data_start
+
+
+def _events_to_array(events: List[Event]) -> np.ndarray:
+	"""把Event列表转换为结构化数组"""
+	if events:
+		return np.array([(e.x, e.y, e.t, e.p) for e in events], dtype=EVENT_DTYPE)
+	return np.array([], dtype=EVENT_DTYPE)
+
+
+def _trigger_events_to_array(trigger_events: List[TriggerEvent]) -> np.ndarray:
+	"""把TriggerEvent列表转换为结构化数组"""
+	if trigger_events:
+		return np.array([(te.t, te.id, te.value) for te in trigger_events], dtype=TRIGGER_EVENT_DTYPE)
+	return np.array([], dtype=TRIGGER_EVENT_DTYPE)
+
+
+def decode_words_python(decoder: EVT3Decoder, words: np.ndarray, max_events: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	用 EVT3Decoder.decode_word 逐字解码一块EVT3字（参考实现）
 	
-	# 读取并解码事件数据
+	Args:
+		decoder: 解码器，状态在调用之间保持
+		words: uint16 EVT3字
+		max_events: 最多解码的事件数（None表示不限制），达到后在当前字之后停止
+		
+	Returns:
+		(events_array, trigger_events_array)
+	"""
 	events = []
 	trigger_events = []
+	for word in words.tolist():
+		decoded_events, decoded_triggers = decoder.decode_word(word)
+		events.extend(decoded_events)
+		trigger_events.extend(decoded_triggers)
+		
+		# 检查是否达到最大事件数
+		if max_events is not None and len(events) >= max_events:
+			events = events[:max_events]
+			break
+	
+	return _events_to_array(events), _trigger_events_to_array(trigger_events)
+
+
+def decode_words_numba(decoder: EVT3Decoder, words: np.ndarray, max_events: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	用numba编译的状态机解码一块EVT3字，结果与 decode_words_python 相同
+	
+	先扫描一遍统计事件数，预先分配输出数组，再扫描一遍直接填入各列。解码器状态从 decoder 读入并写回。
+	"""
+	from src.numba_kernels import evt3_count, evt3_fill
+	
+	num_events, num_triggers = evt3_count(words)
+	events = np.empty(num_events, dtype=EVENT_DTYPE)
+	trigger_events = np.empty(num_triggers, dtype=TRIGGER_EVENT_DTYPE)
+	state = np.array([decoder.time_high, decoder.time_low, decoder.current_y,
+					  decoder.vect_base_x, decoder.vect_base_polarity], dtype=np.int64)
+	type_counts = np.zeros(16, dtype=np.int64)
+	limit = max_events if max_events is not None else np.iinfo(np.int64).max
+	num_events, num_triggers = evt3_fill(words, state, limit, events['x'], events['y'], events['t'], events['p'],
+										 trigger_events['t'], trigger_events['id'], trigger_events['value'], type_counts)
+	
+	decoder.time_high, decoder.time_low, decoder.current_y, decoder.vect_base_x, decoder.vect_base_polarity = state.tolist()
+	for event_type in np.flatnonzero(type_counts).tolist():
+		decoder.event_type_cnt[event_type] = decoder.event_type_cnt.get(event_type, 0) + int(type_counts[event_type])
+	
+	return events[:num_events], trigger_events[:num_triggers]
+
+
+def iter_evt3_chunks(filename: str, max_events: Optional[int] = None, chunk_bytes: int = CHUNK_BYTES,
+					 decoder: Optional[EVT3Decoder] = None, backend: str = 'auto') -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+	"""
+	分块读取EVT3格式的事件数据，解码器状态在块之间保持
 	
+	Args:
+		filename: RAW文件路径
+		max_events: 最大读取事件数量（None表示读取全部）
+		chunk_bytes: 每块读取的字节数
+		decoder: 使用的解码器（None表示新建一个）
+		backend: 解码后端，'auto'、'python' 或 'numba'（见 src.backends）
+		
+	Returns:
+		依次产生 (events_array, trigger_events_array)，块内和块间都按解码顺序排列
+	"""
+	header, data_start = read_evt3_header(filename)
+	if decoder is None:
+		decoder = EVT3Decoder(header["width"], header["height"])
+	decode_words = decode_words_numba if resolve_backend(backend) == 'numba' else decode_words_python
+	chunk_bytes -= chunk_bytes % 2
+	
+	event_count = 0
 	with open(filename, 'rb') as f:
 		f.seek(data_start)
 		
-		event_count = 0
-		trigger_count = 0
-		while True:
-			# 读取2字节的EVT3数据字
-			data = f.read(2)
+		while max_events is None or event_count < max_events:
+			data = f.read(chunk_bytes)
 			if len(data) < 2:
 				break
 			
-			# 解析为16位整数（小端序）
-			word = struct.unpack('<H', data)[0]
-			
-			# 解码该字
-			decoded_events, decoded_triggers = decoder.decode_word(word)
+			# 解析为16位整数（小端序），末尾不完整的字节丢弃
+			words = np.frombuffer(data[:len(data) - len(data) % 2], dtype='<u2')
 			
-			# 添加解码得到的事件
-			events.extend(decoded_events)
-			trigger_events.extend(decoded_triggers)
-			event_count += len(decoded_events)
-			trigger_count += len(decoded_triggers)
+			events, trigger_events = decode_words(decoder, words, None if max_events is None else max_events - event_count)
+			event_count += len(events)
+			yield events, trigger_events
 			
-			# 检查是否达到最大事件数
-			if max_events is not None and event_count >= max_events:
-				events = events[:max_events]
+			print(f"已处理 {(f.tell() - data_start) // 1000000}MB, 解码 {event_count} 个事件")
+
+
+def scan_evt3_triggers(filename: str, chunk_bytes: int = CHUNK_BYTES) -> np.ndarray:
+	"""
+	只扫描EVT3数据流中的EXT_TRIGGER事件（向量化实现，不解码CD事件）
+	
+	时间戳的计算与 EVT3Decoder 一致：取该字之前最近的 EVT_TIME_HIGH 和 EVT_TIME_LOW，
+	再按24位回绕展开（用每个字位置上的时间展开，不受触发事件稀疏的影响），
+	因此返回的时间戳单调不减，与对事件流使用 TimestampUnwrapper 的结果一致。
+	
+	Args:
+		filename: RAW文件路径
+		chunk_bytes: 每块读取的字节数
+		
+	Returns:
+		trigger_events_array: 结构化数组，列为[t, id, value]，t 已展开回绕
+	"""
+	header, data_start = read_evt3_header(filename)
+	chunk_bytes -= chunk_bytes % 2
+	
+	time_high = 0
+	time_low = 0
+	unwrapper = TimestampUnwrapper()
+	chunks = []
+	with open(filename, 'rb') as f:
+		f.seek(data_start)
+		while True:
+			data = f.read(chunk_bytes)
+			if len(data) < 2:
 				break
+			words = np.frombuffer(data[:len(data) - len(data) % 2], dtype='<u2')
+			event_types = words >> 12
 			
-			# 每100万字节显示进度
-			if f.tell() % 1000000 == 0:
-				print(f"已处理 {f.tell() // 1000000}MB, 解码 {len(events)} 个事件, {len(trigger_events)} 个触发事件")
+			# 每个位置上最近一次 TIME_HIGH / TIME_LOW 的下标（-1表示沿用上一块的状态）
+			positions = np.arange(len(words))
+			last_high = np.maximum.accumulate(np.where(event_types == EVT3Decoder.EVT_TIME_HIGH, positions, -1))
+			last_low = np.maximum.accumulate(np.where(event_types == EVT3Decoder.EVT_TIME_LOW, positions, -1))
+			highs = np.where(last_high >= 0, words[last_high] & 0xFFF, time_high).astype(np.uint64)
+			lows = np.where(last_low >= 0, words[last_low] & 0xFFF, time_low).astype(np.uint64)
+			
+			is_trigger = event_types == EVT3Decoder.EXT_TRIGGER
+			trigger_words = words[is_trigger]
+			trigger_events = np.empty(len(trigger_words), dtype=TRIGGER_EVENT_DTYPE)
+			word_ts = unwrapper((highs << np.uint64(12)) | lows)
+			trigger_events['t'] = word_ts[is_trigger]
+			trigger_events['id'] = (trigger_words >> 8) & 0xF
+			trigger_events['value'] = trigger_words & 0x1
+			chunks.append(trigger_events)
+			
+			time_high = int(highs[-1])
+			time_low = int(lows[-1])
 	
-	print(f"总共解码 {len(events)} 个事件, {len(trigger_events)} 个触发事件")
-	print(f"事件类型计数: {decoder.event_type_cnt}")
+	if not chunks:
+		return np.array([], dtype=TRIGGER_EVENT_DTYPE)
+	return np.concatenate(chunks)
+
+
+def read_evt3_events(filename: str, max_events: Optional[int] = None, backend: str = 'auto') -> Tuple[np.ndarray, np.ndarray, Dict[str, str]]:
+	"""
+	读取EVT3格式的事件数据
 	
-	# 转换为numpy数组
-	if events:
-		events_array = np.array([(e.x, e.y, e.t, e.p) for e in events], 
-							   dtype=[('x', np.uint16), ('y', np.uint16), 
-									 ('t', np.uint64), ('p', np.uint8)])
-	else:
-		events_array = np.array([], dtype=[('x', np.uint16), ('y', np.uint16), 
-										  ('t', np.uint64), ('p', np.uint8)])
+	Args:
+		filename: RAW文件路径
+		max_events: 最大读取事件数量（None表示读取全部）
+		backend: 解码后端，'auto'、'python' 或 'numba'
+		
+	Returns:
+		(events_array, trigger_events_array, header_info)
+		events_array: Nx4的numpy数组，列为[x, y, t, p]
+		trigger_events_array: Nx3的numpy数组，列为[t, id, value]
+		header_info: 头部信息字典
+	"""
+	# 读取头部信息
+	header, data_start = read_evt3_header(filename)
+	width = header["width"]
+	height = header["height"]
 	
-	if trigger_events:
-		trigger_events_array = np.array([(te.t, te.id, te.value) for te in trigger_events],
-									   dtype=[('t', np.uint64), ('id', np.uint8), 
-											 ('value', np.uint8)])
-	else:
-		trigger_events_array = np.array([], dtype=[('t', np.uint64), ('id', np.uint8), 
-												  ('value', np.uint8)])
+	print(f"文件格式: {header['format'].split(';')[0]}")
+	print(f"分辨率: {width}x{height}")
+	print(f"数据开始位置: {data_start}")
+	print(f"解码后端: {resolve_backend(backend)}")
+	
+	# 创建解码器
+	decoder = EVT3Decoder(width, height)
+	
+	# 读取并解码事件数据
+	chunks = list(iter_evt3_chunks(filename, max_events, decoder=decoder, backend=backend))
+	events_array = np.concatenate([events for events, _ in chunks]) if chunks else np.array([], dtype=EVENT_DTYPE)
+	trigger_events_array = np.concatenate([triggers for _, triggers in chunks]) if chunks else np.array([], dtype=TRIGGER_EVENT_DTYPE)
+	
+	print(f"总共解码 {len(events_array)} 个事件, {len(trigger_events_array)} 个触发事件")
+	print(f"事件类型计数: {decoder.event_type_cnt}")
 	
 	return events_array, trigger_events_array, header
@@ -0,0 +1,70 @@
+import numpy as np
+from typing import Tuple
+from src.read_raw import TimestampUnwrapper
+
+
+def trigger_windows(trigger_events: np.ndarray, trigger_id: int = 0, start_value: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	把触发边沿配对成曝光窗口 [t_start, t_end)
+
+	一个窗口从 start_value 边沿开始，到紧随其后的相反边沿结束；没有配对的边沿被忽略。
+	触发时间戳先按24位回绕展开（所有通道一起展开），再按通道配对，
+	要求相邻触发事件的间隔小于半个回绕周期（约8.4秒）。
+
+	Args:
+		trigger_events: 触发事件数组，列为[t, id, value]
+		trigger_id: 使用的触发通道ID
+		start_value: 窗口开始的边沿（1: 上升沿, 0: 下降沿）
+
+	Returns:
+		(t_start, t_end)，均为展开回绕后按时间排序的uint64数组
+	"""
+	ts = TimestampUnwrapper()(trigger_events['t'])
+	in_channel = trigger_events['id'] == trigger_id
+	order = np.argsort(ts[in_channel], kind='stable')
+	channel_ts = ts[in_channel][order]
+	channel_values = trigger_events['value'][in_channel][order]
+	is_pair = (channel_values[:-1] == start_value) & (channel_values[1:] != start_value)
+	starts = np.flatnonzero(is_pair)
+	return channel_ts[starts].astype(np.uint64), channel_ts[starts + 1].astype(np.uint64)
+
+
+def find_window_ranges(ts: np.ndarray, t_start: np.ndarray, t_end: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	一次性求出所有窗口在事件数组中的下标范围
+
+	Args:
+		ts: 按时间排序（已展开回绕）的事件时间戳
+		t_start, t_end: 窗口起止时间
+
+	Returns:
+		(begin, end)，第i个窗口的事件为 events[begin[i]:end[i]]
+	"""
+	return np.searchsorted(ts, t_start.astype(ts.dtype), side='left'), np.searchsorted(ts, t_end.astype(ts.dtype), side='left')
+
+
+def slice_events_by_triggers(events: np.ndarray, trigger_events: np.ndarray, trigger_id: int = 0,
+							 start_value: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+	"""
+	按触发信号把事件切分成曝光窗口
+
+	事件和触发事件的时间戳都按24位回绕展开后再配对和查找，
+	因此可以处理超过16.7秒、时间戳已经回绕的EVT3录制。
+
+	Args:
+		events: 按时间排序（允许24位回绕）的事件数组
+		trigger_events: 触发事件数组
+		trigger_id: 使用的触发通道ID
+		start_value: 窗口开始的边沿（1: 上升沿, 0: 下降沿）
+
+	Returns:
+		(t_start, t_end, begin, end)，t_start/t_end 为展开回绕后的时间，第i个窗口的事件为 events[begin[i]:end[i]]
+	"""
+	ts = TimestampUnwrapper()(events['t'])
+	if np.any(ts[1:] < ts[:-1]):
+		raise ValueError("事件时间戳未排序（按24位回绕计），无法按窗口切分")
+
+	t_start, t_end = trigger_windows(trigger_events, trigger_id, start_value)
+	begin, end = find_window_ranges(ts, t_start, t_end)
+	print(f"触发通道 {trigger_id}: {len(t_start)} 个窗口, 共包含 {int(np.sum(end - begin))} 个事件")
+	return t_start, t_end, begin, end
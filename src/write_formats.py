@@ -1,5 +1,7 @@
+import os
 import numpy as np
-from typing import Dict
+from typing import Dict, Iterable, Tuple
+from src.read_raw import TimestampUnwrapper
 
 def save_events_to_csv(events: np.ndarray, filename: str):
 	"""将事件保存为CSV格式"""
@@ -34,6 +36,11 @@ def save_events_to_npz(events: np.ndarray, trigger_events: np.ndarray, header: D
 	np.savez(filename, events=events, trigger_events=trigger_events, header=header)
 	print(f"事件已保存到: {filename}")
 
+def save_windows_to_npz(t_start: np.ndarray, t_end: np.ndarray, begin: np.ndarray, end: np.ndarray, filename: str):
+	"""将曝光窗口 [t_start, t_end) 及其在事件数组中的下标范围 [begin, end) 保存为NPZ格式"""
+	np.savez(filename, t_start=t_start, t_end=t_end, begin=begin, end=end)
+	print(f"{len(t_start)} 个窗口已保存到: {filename}")
+
 def save_events_to_h5(events: np.ndarray, trigger_events: np.ndarray, header: Dict[str, str], filename: str):
 	'''
 	h5 格式要求：
@@ -100,4 +107,133 @@ def save_events_to_h5(events: np.ndarray, trigger_events: np.ndarray, header: Di
 			trigger_group.create_dataset('ids', data=trigger_events['id'].astype(np.uint8), compression="gzip", compression_opts=cpr)
 			trigger_group.create_dataset('values', data=trigger_events['value'].astype(np.uint8), compression="gzip", compression_opts=cpr)
 
-	print(f"事件已保存到: {filename}")
\ No newline at end of file
+	print(f"事件已保存到: {filename}")
+
+
+def trigger_events_filename(filename: str) -> str:
+	"""由事件文件路径得到对应的触发事件文件路径，例如 events.arrow -> events_trigger.arrow"""
+	root, ext = os.path.splitext(filename)
+	return f"{root}_trigger{ext}"
+
+
+def _arrow_schema(dtype: np.dtype, header: Dict[str, str]):
+	"""由结构化数组的dtype生成Arrow schema，头部信息保存为schema metadata"""
+	import pyarrow as pa
+
+	fields = [pa.field(name, pa.from_numpy_dtype(dtype[name]), nullable=False) for name in dtype.names]
+	metadata = {str(key): str(value) for key, value in header.items()}
+	return pa.schema(fields, metadata=metadata)
+
+
+def _to_record_batch(array: np.ndarray, schema):
+	"""把结构化数组按列转换为Arrow record batch"""
+	import pyarrow as pa
+
+	columns = [pa.array(np.ascontiguousarray(array[name])) for name in schema.names]
+	return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def save_event_chunks_to_arrow(chunks: Iterable[Tuple[np.ndarray, np.ndarray]], header: Dict[str, str], filename: str):
+	"""
+	把 (events, trigger_events) 分块流式写入Arrow IPC文件
+	
+	事件写入 filename，触发事件写入 trigger_events_filename(filename)。
+	每个非空的块写成一个record batch，schema由第一个块的dtype决定，
+	因此可以带额外的列（例如多相机合并时的camera列）。
+	
+	Args:
+		chunks: 产生 (events, trigger_events) 结构化数组的可迭代对象
+		header: 头部信息字典，保存为schema metadata
+		filename: 输出Arrow IPC文件路径
+	"""
+	import pyarrow as pa
+
+	event_writer = None
+	trigger_writer = None
+	num_events = 0
+	num_triggers = 0
+	try:
+		for events, trigger_events in chunks:
+			if event_writer is None:
+				event_schema = _arrow_schema(events.dtype, header)
+				trigger_schema = _arrow_schema(trigger_events.dtype, header)
+				event_writer = pa.ipc.new_file(filename, event_schema)
+				trigger_writer = pa.ipc.new_file(trigger_events_filename(filename), trigger_schema)
+			if len(events) > 0:
+				event_writer.write_batch(_to_record_batch(events, event_schema))
+				num_events += len(events)
+			if len(trigger_events) > 0:
+				trigger_writer.write_batch(_to_record_batch(trigger_events, trigger_schema))
+				num_triggers += len(trigger_events)
+	finally:
+		if event_writer is not None:
+			event_writer.close()
+			trigger_writer.close()
+
+	print(f"{num_events} 个事件已保存到: {filename}")
+	print(f"{num_triggers} 个触发事件已保存到: {trigger_events_filename(filename)}")
+
+
+def save_events_to_arrow(events: np.ndarray, trigger_events: np.ndarray, header: Dict[str, str], filename: str):
+	"""
+	将事件和触发事件保存为Arrow IPC格式（列式存储，可以内存映射零拷贝读取）
+	
+	事件和触发事件各写成一个record batch，read_arrow_events 读取时不发生拷贝。
+	
+	Args:
+		events: 事件结构化数组
+		trigger_events: 触发事件结构化数组
+		header: 头部信息字典
+		filename: 输出Arrow IPC文件路径（触发事件写入 trigger_events_filename(filename)）
+	"""
+	save_event_chunks_to_arrow([(events, trigger_events)], header, filename)
+
+
+def _write_parquet_by_time(array: np.ndarray, header: Dict[str, str], filename: str, row_group_duration_us: int):
+	"""
+	按时间窗口把已按t排序的结构化数组写成Parquet，每个时间窗口一个row group
+
+	t 按24位回绕展开后切分，并且在每次回绕处另起一个row group，
+	保证每个row group内 t 的 min/max 统计不超过一个时间窗口。
+	"""
+	import pyarrow as pa
+	import pyarrow.parquet as pq
+
+	schema = _arrow_schema(array.dtype, header)
+	ts = TimestampUnwrapper()(array['t'])
+	if np.any(ts[1:] < ts[:-1]):
+		raise ValueError(f"时间戳未排序（按24位回绕计），无法按时间写入Parquet: {filename}")
+	if len(ts) > 0:
+		edges = np.arange(ts[0], ts[-1] + row_group_duration_us, row_group_duration_us)
+		wraps = np.flatnonzero(np.diff(ts - array['t'].astype(np.int64)) != 0) + 1
+		bounds = np.unique(np.concatenate(([0], np.searchsorted(ts, edges[1:]), wraps, [len(ts)])))
+	else:
+		# 空数组也写一个空的row group，保证文件有schema
+		bounds = np.array([0, 0])
+
+	with pq.ParquetWriter(filename, schema, write_statistics=True) as writer:
+		for start, end in zip(bounds[:-1], bounds[1:]):
+			table = pa.Table.from_batches([_to_record_batch(array[start:end], schema)], schema=schema)
+			writer.write_table(table, row_group_size=max(int(end - start), 1))
+
+
+def save_events_to_parquet(events: np.ndarray, trigger_events: np.ndarray, header: Dict[str, str], filename: str, row_group_duration_us: int = 1000000):
+	"""
+	将事件和触发事件保存为Parquet格式
+	
+	按时间切分row group（每个row group覆盖 row_group_duration_us 微秒），并写入列统计信息，
+	读取端（Polars/DuckDB等）可以根据 t 的 min/max 统计跳过不需要的row group。
+	要求事件按时间戳排序（允许EVT3时间戳的24位回绕），t 保存原值，不做展开。
+	
+	Args:
+		events: 事件结构化数组
+		trigger_events: 触发事件结构化数组
+		header: 头部信息字典，保存为schema metadata
+		filename: 输出Parquet文件路径（触发事件写入 trigger_events_filename(filename)）
+		row_group_duration_us: 每个row group覆盖的时间长度（微秒）
+	"""
+	_write_parquet_by_time(events, header, filename, row_group_duration_us)
+	_write_parquet_by_time(trigger_events, header, trigger_events_filename(filename), row_group_duration_us)
+
+	print(f"事件已保存到: {filename}")
+	print(f"触发事件已保存到: {trigger_events_filename(filename)}")
@@ -0,0 +1,198 @@
+import numpy as np
+from typing import Dict, Tuple, Iterable, Optional
+from src.read_raw import EVT3Decoder, TimestampUnwrapper, TIMESTAMP_PERIOD
+
+
+class EVT3Encoder:
+	"""
+	EVT3格式编码器（向量化实现）
+
+	编码规则：
+	- 只在时间变化时输出 EVT_TIME_HIGH / EVT_TIME_LOW
+	- 只在行变化时输出 EVT_ADDR_Y
+	- 同一时间、同一行、同一极性、x递增且间隔不超过12的连续事件构成一个run，
+	  用 VECT_BASE_X + VECT_12/VECT_8 编码；逐个用 EVT_ADDR_X 编码字数更少时改用后者
+	- 状态（当前时间和行）在多次 encode 调用之间保持，可以对分块的事件流逐块编码
+
+	时间戳只有24位（12位TIME_HIGH + 12位TIME_LOW），约16.7秒回绕一次：
+	- 输入时间戳小于 2^24 时，允许按24位回绕单调：下降超过 2^23 视为一次回绕，
+	  因此 EVT3Decoder 解码出的长录制（时间戳已回绕）可以原样重新编码
+	- 输入时间戳大于等于 2^24 时，只有 wrap_timestamps=True 才编码其低24位，否则报错，
+	  不会静默截断；解码结果是回绕后的时间戳
+	"""
+
+	VECT_12_BITS = 12
+	VECT_8_BITS = 8
+
+	def __init__(self, wrap_timestamps: bool = False):
+		"""
+		初始化编码器
+
+		Args:
+			wrap_timestamps: 是否允许大于等于 2^24 的时间戳，按24位回绕编码
+		"""
+		self.wrap_timestamps = wrap_timestamps
+		self.reset_state()
+
+	def reset_state(self):
+		"""重置编码器状态，下一个事件会重新输出时间和行"""
+		self.time_high = -1
+		self.time_low = -1
+		self.current_y = -1
+		# 从上一个输出的时间戳接着展开24位回绕
+		self.unwrapper = TimestampUnwrapper()
+
+	def encode(self, events: np.ndarray, trigger_events: np.ndarray) -> np.ndarray:
+		"""
+		把一块事件和触发事件编码为EVT3字
+
+		Args:
+			events: 按时间排序的事件数组，列为[x, y, t, p]
+			trigger_events: 按时间排序的触发事件数组，列为[t, id, value]
+
+		Returns:
+			uint16数组，按解码顺序排列的EVT3字
+		"""
+		xs = events['x'].astype(np.int64)
+		ys = events['y'].astype(np.int64)
+		ps = events['p'].astype(np.int64)
+		raw_ts = events['t'].astype(np.int64)
+		raw_trigger_ts = trigger_events['t'].astype(np.int64)
+		if not self.wrap_timestamps and ((len(raw_ts) > 0 and raw_ts.max() >= TIMESTAMP_PERIOD) or
+										 (len(raw_trigger_ts) > 0 and raw_trigger_ts.max() >= TIMESTAMP_PERIOD)):
+			raise ValueError("时间戳超出EVT3的24位范围，设置 wrap_timestamps=True 才会按24位回绕编码")
+		ts = self.unwrapper.unwrap(raw_ts)
+		trigger_ts = self.unwrapper.unwrap(raw_trigger_ts)
+		last_t = self.unwrapper.last_t
+		if np.any(np.diff(ts, prepend=last_t) < 0) or np.any(np.diff(trigger_ts, prepend=last_t) < 0):
+			raise ValueError("事件时间戳未排序（按24位回绕计），无法编码为EVT3")
+		if len(events) > 0 and (xs.max() > 0x7FF or ys.max() > 0x7FF or ps.max() > 1):
+			raise ValueError("事件坐标或极性超出EVT3可表示的范围")
+		if len(trigger_events) > 0 and (trigger_events['id'].max() > 0xF or trigger_events['value'].max() > 1):
+			raise ValueError("触发通道ID或触发值超出EVT3可表示的范围")
+
+		# 检测run：时间、行、极性相同，x严格递增且相邻间隔不超过一个VECT_12的宽度
+		dx = np.diff(xs)
+		new_run = np.ones(len(events), dtype=bool)
+		new_run[1:] = (np.diff(ts) != 0) | (np.diff(ys) != 0) | (np.diff(ps) != 0) | (dx <= 0) | (dx > self.VECT_12_BITS)
+		run_starts = np.flatnonzero(new_run)
+		run_ids = np.cumsum(new_run) - 1
+		run_ends = np.append(run_starts, len(events))[1:]
+		run_lengths = run_ends - run_starts
+		run_x0 = xs[run_starts]
+		run_span = xs[run_ends - 1] - run_x0 + 1
+		run_blocks = -(-run_span // self.VECT_12_BITS)
+		use_vector = 1 + run_blocks < run_lengths
+
+		# 把run和触发事件按时间合并，时间相同时触发事件在前
+		num_runs = len(run_starts)
+		item_ts = np.concatenate((trigger_ts, ts[run_starts]))
+		order = np.argsort(item_ts, kind='stable')
+		item_ts = item_ts[order]
+		is_run = order >= len(trigger_ts)
+		item_run = np.where(is_run, order - len(trigger_ts), 0)
+
+		# 时间和行只在变化时输出
+		time_high = (item_ts >> 12) & 0xFFF
+		time_low = item_ts & 0xFFF
+		emit_high = time_high != np.concatenate(([self.time_high], time_high[:-1]))
+		emit_low = time_low != np.concatenate(([self.time_low], time_low[:-1]))
+		run_y = ys[run_starts]
+		run_emit_y = run_y != np.concatenate(([self.current_y], run_y[:-1]))
+		emit_y = is_run & run_emit_y[item_run] if num_runs > 0 else np.zeros(len(order), dtype=bool)
+
+		payload = np.ones(len(order), dtype=np.int64)
+		payload[is_run] = np.where(use_vector, 1 + run_blocks, run_lengths)[item_run[is_run]]
+		counts = emit_high.astype(np.int64) + emit_low + emit_y + payload
+		item_offsets = np.cumsum(counts) - counts
+		payload_offsets = item_offsets + counts - payload
+		words = np.zeros(int(counts.sum()), dtype=np.uint16)
+
+		words[item_offsets[emit_high]] = (EVT3Decoder.EVT_TIME_HIGH << 12) | time_high[emit_high]
+		words[(item_offsets + emit_high)[emit_low]] = (EVT3Decoder.EVT_TIME_LOW << 12) | time_low[emit_low]
+		words[(item_offsets + emit_high + emit_low)[emit_y]] = (EVT3Decoder.EVT_ADDR_Y << 12) | run_y[item_run[emit_y]]
+
+		is_trigger = ~is_run
+		trigger_idx = order[is_trigger]
+		words[payload_offsets[is_trigger]] = (EVT3Decoder.EXT_TRIGGER << 12) | \
+			(trigger_events['id'][trigger_idx].astype(np.int64) << 8) | trigger_events['value'][trigger_idx]
+
+		run_payload = np.zeros(num_runs, dtype=np.int64)
+		run_payload[item_run[is_run]] = payload_offsets[is_run]
+
+		# 单个事件：EVT_ADDR_X
+		single = ~use_vector[run_ids]
+		rank = np.arange(len(events)) - run_starts[run_ids]
+		words[run_payload[run_ids[single]] + rank[single]] = \
+			(EVT3Decoder.EVT_ADDR_X << 12) | (ps[single] << 11) | xs[single]
+
+		# 向量事件：VECT_BASE_X，然后每12个x一个VECT_12，最后一段不超过8个x时用VECT_8
+		vector_runs = np.flatnonzero(use_vector)
+		words[run_payload[vector_runs]] = (EVT3Decoder.VECT_BASE_X << 12) | (ps[run_starts[vector_runs]] << 11) | run_x0[vector_runs]
+		block_counts = run_blocks[vector_runs]
+		block_run = np.repeat(vector_runs, block_counts)
+		block_index = np.arange(len(block_run)) - np.repeat(np.cumsum(block_counts) - block_counts, block_counts)
+		is_last_block = block_index == run_blocks[block_run] - 1
+		last_block_width = run_span[block_run] - block_index * self.VECT_12_BITS
+		block_type = np.where(is_last_block & (last_block_width <= self.VECT_8_BITS), EVT3Decoder.VECT_8, EVT3Decoder.VECT_12)
+		words[run_payload[block_run] + 1 + block_index] = block_type << 12
+
+		vector = use_vector[run_ids]
+		x_offset = xs[vector] - run_x0[run_ids[vector]]
+		bit_positions = run_payload[run_ids[vector]] + 1 + x_offset // self.VECT_12_BITS
+		bits = np.bincount(bit_positions, weights=1 << (x_offset % self.VECT_12_BITS), minlength=len(words))
+		words += bits.astype(np.uint16)
+
+		# 更新状态
+		if len(order) > 0:
+			self.time_high = int(time_high[-1])
+			self.time_low = int(time_low[-1])
+		if num_runs > 0:
+			self.current_y = int(run_y[-1])
+		self.unwrapper.advance(raw_ts, ts)
+		self.unwrapper.advance(raw_trigger_ts, trigger_ts)
+
+		return words
+
+
+def _raw_header_text(header: Dict[str, str]) -> str:
+	"""生成RAW文件头部：原文件是EVT3格式时保留原头部，否则生成新的头部"""
+	lines = []
+	if str(header.get('format', '')).startswith('EVT3'):
+		lines = [line for line in header.get('header_text', '').splitlines() if line.startswith('%')]
+	if not lines:
+		lines = [f"% format EVT3;height={int(header.get('height', 720))};width={int(header.get('width', 1280))}"]
+	if lines[-1] != '% end':
+		lines.append('% end')
+	return "\n".join(lines) + "\n"
+
+
+def save_event_chunks_to_raw(chunks: Iterable[Tuple[np.ndarray, np.ndarray]], header: Dict[str, str], filename: str,
+							 encoder: Optional[EVT3Encoder] = None):
+	"""
+	把 (events, trigger_events) 分块流式编码写入EVT3格式RAW文件
+
+	Args:
+		chunks: 产生 (events, trigger_events) 的可迭代对象，块间时间戳单调不减（允许24位回绕）
+		header: 头部信息字典
+		filename: 输出RAW文件路径
+		encoder: 使用的编码器（None表示新建一个）
+	"""
+	if encoder is None:
+		encoder = EVT3Encoder()
+
+	num_words = 0
+	with open(filename, 'wb') as f:
+		f.write(_raw_header_text(header).encode('ascii'))
+		for events, trigger_events in chunks:
+			words = encoder.encode(events, trigger_events)
+			f.write(words.astype('<u2').tobytes())
+			num_words += len(words)
+
+	print(f"事件已编码为 {num_words} 个EVT3字 ({num_words * 2 / 1e6:.2f}MB), 保存到: {filename}")
+
+
+def save_events_to_raw(events: np.ndarray, trigger_events: np.ndarray, header: Dict[str, str], filename: str,
+					   wrap_timestamps: bool = False):
+	"""将事件和触发事件编码为EVT3格式的RAW文件，wrap_timestamps 见 EVT3Encoder"""
+	save_event_chunks_to_raw([(events, trigger_events)], header, filename, EVT3Encoder(wrap_timestamps))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 让测试可以像 event_reader.py 一样 import src.*
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
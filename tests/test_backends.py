@@ -0,0 +1,119 @@
+import struct
+import numpy as np
+import pytest
+from src.read_raw import EVT3Decoder, EVENT_DTYPE, TRIGGER_EVENT_DTYPE, iter_evt3_chunks, CHUNK_BYTES
+from src.read_aedat import read_aedat3_events
+from src.write_raw import EVT3Encoder
+
+pytest.importorskip('numba')
+
+WIDTH, HEIGHT = 160, 120
+# 文件开头是一个20个事件的向量run：VECT_BASE_X + VECT_12 + VECT_8
+RUN_LENGTH = 20
+
+
+def make_evt3_words() -> np.ndarray:
+	rng = np.random.default_rng(0)
+	num_events = 20000
+	events = np.zeros(num_events, dtype=EVENT_DTYPE)
+	events['t'] = np.sort(rng.integers(0, 200000, num_events) // 7 * 7)
+	events['y'] = rng.integers(0, HEIGHT, num_events)
+	events['x'] = rng.integers(0, WIDTH, num_events)
+	events['p'] = rng.integers(0, 2, num_events)
+	events[:RUN_LENGTH] = [(x, 1, 0, 1) for x in range(RUN_LENGTH)]
+	events = events[np.lexsort((events['x'], events['p'], events['y'], events['t']))]
+	triggers = np.zeros(50, dtype=TRIGGER_EVENT_DTYPE)
+	triggers['t'] = np.sort(rng.integers(1, 200000, len(triggers)))
+	triggers['id'] = rng.integers(0, 2, len(triggers))
+	triggers['value'] = np.arange(len(triggers)) % 2
+
+	# 在中间插入解码器只计数不产生事件的字
+	encoder = EVT3Encoder()
+	half = num_events // 2
+	extra = np.array([(EVT3Decoder.OTHERS << 12) | 0x123, (EVT3Decoder.CONTINUED_4 << 12) | 0x5,
+					  (EVT3Decoder.CONTINUED_12 << 12) | 0xABC], dtype=np.uint16)
+	first = encoder.encode(events[:half], triggers[triggers['t'] <= events['t'][half - 1]])
+	second = encoder.encode(events[half:], triggers[triggers['t'] > events['t'][half - 1]])
+	return np.concatenate((first, extra, second))
+
+
+@pytest.fixture(scope='module')
+def raw_file(tmp_path_factory):
+	filename = str(tmp_path_factory.mktemp('data') / 'test.raw')
+	with open(filename, 'wb') as f:
+		f.write(f"% format EVT3;height={HEIGHT};width={WIDTH}\n% end\n".encode('ascii'))
+		f.write(make_evt3_words().astype('<u2').tobytes())
+	return filename
+
+
+@pytest.fixture(scope='module')
+def aedat_file(tmp_path_factory):
+	rng = np.random.default_rng(1)
+	filename = str(tmp_path_factory.mktemp('data') / 'test.aedat')
+	with open(filename, 'wb') as f:
+		f.write(b"#!AER-DAT3.1\r\n#Format: RAW\r\n#Source 1: DVS128\r\n#Start-Data\r\n")
+		t = 0
+		for num_events in (0, 37, 300, 1, 128):
+			f.write(struct.pack('<HHLLLLLL', 1, 1, 8, 4, 0, num_events, num_events, num_events))
+			for _ in range(num_events):
+				t += int(rng.integers(0, 20))
+				x, y, p = (int(v) for v in rng.integers(0, (128, 128, 2)))
+				f.write(struct.pack('<LL', (x << 17) | (y << 2) | (p << 1) | 1, t))
+	return filename
+
+
+def decode_evt3(filename, backend, max_events=None, chunk_bytes=CHUNK_BYTES):
+	decoder = EVT3Decoder(WIDTH, HEIGHT)
+	chunks = list(iter_evt3_chunks(filename, max_events, chunk_bytes, decoder, backend))
+	events = np.concatenate([events for events, _ in chunks])
+	trigger_events = np.concatenate([trigger_events for _, trigger_events in chunks])
+	return events, trigger_events, decoder.event_type_cnt
+
+
+def assert_same_decoding(filename, **kwargs):
+	python_events, python_triggers, python_counts = decode_evt3(filename, 'python', **kwargs)
+	numba_events, numba_triggers, numba_counts = decode_evt3(filename, 'numba', **kwargs)
+	assert python_events.dtype == numba_events.dtype == EVENT_DTYPE
+	assert python_triggers.dtype == numba_triggers.dtype == TRIGGER_EVENT_DTYPE
+	np.testing.assert_array_equal(numba_events, python_events)
+	np.testing.assert_array_equal(numba_triggers, python_triggers)
+	assert numba_counts == python_counts
+	return python_events, python_triggers, python_counts
+
+
+def test_evt3_full_read(raw_file):
+	events, trigger_events, counts = assert_same_decoding(raw_file)
+	assert len(events) == 20000 and len(trigger_events) == 50
+	for event_type in (EVT3Decoder.VECT_12, EVT3Decoder.VECT_8, EVT3Decoder.OTHERS,
+					   EVT3Decoder.CONTINUED_4, EVT3Decoder.CONTINUED_12):
+		assert counts[event_type] > 0
+
+
+@pytest.mark.parametrize("max_events", [1, 5, 12, 15, RUN_LENGTH - 1, 777, 19999])
+def test_evt3_max_events(raw_file, max_events):
+	# 5 和 15 分别截断在第一个VECT_12和VECT_8字的中间
+	events, _, _ = assert_same_decoding(raw_file, max_events=max_events)
+	assert len(events) == max_events
+
+
+@pytest.mark.parametrize("chunk_bytes", [2, 999, 4097])
+def test_evt3_odd_chunk_bytes(raw_file, chunk_bytes):
+	events, trigger_events, counts = assert_same_decoding(raw_file, chunk_bytes=chunk_bytes)
+	full_events, full_triggers, full_counts = decode_evt3(raw_file, 'numba')
+	np.testing.assert_array_equal(events, full_events)
+	np.testing.assert_array_equal(trigger_events, full_triggers)
+	assert counts == full_counts
+
+
+def test_evt3_max_events_with_chunks(raw_file):
+	assert_same_decoding(raw_file, max_events=1234, chunk_bytes=999)
+
+
+@pytest.mark.parametrize("max_events", [None, 1, 100, 338])
+def test_aedat3(aedat_file, max_events):
+	python_events, python_triggers, _ = read_aedat3_events(aedat_file, max_events, backend='python')
+	numba_events, numba_triggers, _ = read_aedat3_events(aedat_file, max_events, backend='numba')
+	assert python_events.dtype == numba_events.dtype == EVENT_DTYPE
+	np.testing.assert_array_equal(numba_events, python_events)
+	assert len(python_triggers) == len(numba_triggers) == 0
+	assert len(python_events) == (466 if max_events is None else max_events)
@@ -0,0 +1,117 @@
+import os
+import argparse
+import numpy as np
+import pytest
+from src.read_raw import EVENT_DTYPE, TRIGGER_EVENT_DTYPE
+from src.write_raw import save_events_to_raw
+from src.decode_cache import DecodeCache
+from event_reader import decode_events, decode_cache_key
+
+HEADER = {'width': 64, 'height': 32}
+
+
+def make_arrays(num_events: int, seed: int = 0):
+	rng = np.random.default_rng(seed)
+	events = np.zeros(num_events, dtype=EVENT_DTYPE)
+	events['x'] = rng.integers(0, 64, num_events)
+	events['y'] = rng.integers(0, 32, num_events)
+	events['t'] = np.sort(rng.integers(0, 1000000, num_events))
+	events['p'] = rng.integers(0, 2, num_events)
+	trigger_events = np.zeros(10, dtype=TRIGGER_EVENT_DTYPE)
+	trigger_events['t'] = np.sort(rng.integers(0, 1000000, 10))
+	trigger_events['value'] = np.arange(10) % 2
+	return events, trigger_events
+
+
+@pytest.fixture
+def raw_file(tmp_path):
+	filename = str(tmp_path / 'test.raw')
+	save_events_to_raw(*make_arrays(5000), HEADER, filename)
+	return filename
+
+
+def make_args(input_file, **kwargs):
+	args = dict(input_file=input_file, max_events=None, backend='auto', ba_filter_us=None, refractory_us=None,
+				hot_pixel_rate=None, hot_pixel_threshold=None, hot_pixel_sigma=5.0, cache_hash=False)
+	args.update(kwargs)
+	return argparse.Namespace(**args)
+
+
+@pytest.mark.parametrize("options", [{}, {'max_events': 1234}, {'refractory_us': 50, 'ba_filter_us': 20000}])
+def test_hit_matches_fresh_decode(tmp_path, raw_file, options):
+	cache = DecodeCache(str(tmp_path / 'cache'))
+	args = make_args(raw_file, **options)
+	key = decode_cache_key(cache, args, 'raw')
+	assert cache.load(key) is None
+
+	events, trigger_events, header = decode_events(args, 'raw')
+	cache.store(key, events, trigger_events, header, raw_file)
+	cached_events, cached_triggers, cached_header = cache.load(key)
+
+	assert cached_events.dtype == EVENT_DTYPE and cached_triggers.dtype == TRIGGER_EVENT_DTYPE
+	np.testing.assert_array_equal(cached_events, events)
+	np.testing.assert_array_equal(cached_triggers, trigger_events)
+	assert cached_header == header
+	# 命中时直接返回只读的内存映射，不拷贝
+	assert isinstance(cached_events, np.memmap) and not cached_events.flags['WRITEABLE']
+
+
+def test_key_changes_with_inputs(tmp_path, raw_file):
+	cache = DecodeCache(str(tmp_path / 'cache'))
+	key = decode_cache_key(cache, make_args(raw_file), 'raw')
+	assert decode_cache_key(cache, make_args(raw_file), 'raw') == key
+
+	rate_file = str(tmp_path / 'rate.npy')
+	np.save(rate_file, np.ones((32, 64)))
+	variants = [
+		make_args(raw_file, max_events=100),
+		make_args(raw_file, ba_filter_us=1000),
+		make_args(raw_file, refractory_us=10),
+		make_args(raw_file, hot_pixel_rate=rate_file),
+		make_args(raw_file, hot_pixel_rate=rate_file, hot_pixel_threshold=3.0),
+		make_args(raw_file, cache_hash=True),
+	]
+	keys = [key] + [decode_cache_key(cache, args, 'raw') for args in variants]
+	assert len(set(keys)) == len(keys)
+
+	stat = os.stat(raw_file)
+	os.utime(raw_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+	assert decode_cache_key(cache, make_args(raw_file), 'raw') != key
+
+
+def test_store_existing_entry_is_noop(tmp_path, monkeypatch):
+	cache = DecodeCache(str(tmp_path / 'cache'))
+	key = 'a' * 32
+	events, trigger_events = make_arrays(100, seed=1)
+	cache.store(key, events, trigger_events, HEADER)
+
+	other_events, other_triggers = make_arrays(200, seed=2)
+	cache.store(key, other_events, other_triggers, HEADER)
+	np.testing.assert_array_equal(cache.load(key)[0], events)
+
+	# 另一个进程在本进程检查之后、重命名之前写入了同一个条目：重命名失败，临时目录被清理
+	monkeypatch.setattr(os.path, 'exists', lambda path: False)
+	cache.store(key, other_events, other_triggers, HEADER)
+	monkeypatch.undo()
+	np.testing.assert_array_equal(cache.load(key)[0], events)
+	assert os.listdir(cache.cache_dir) == [key]
+
+
+def test_prune_evicts_least_recently_used(tmp_path):
+	cache = DecodeCache(str(tmp_path / 'cache'))
+	keys = [f"{i}" * 32 for i in range(4)]
+	for i, key in enumerate(keys):
+		cache.store(key, *make_arrays(1000, seed=i), HEADER)
+		meta = os.path.join(cache.cache_dir, key, 'meta.json')
+		os.utime(meta, (1000000 + i, 1000000 + i))
+	# 读取最旧的条目会更新它的访问时间
+	assert cache.load(keys[0]) is not None
+	assert [entry["key"] for entry in cache.entries()] == keys[1:] + keys[:1]
+
+	entry_size = cache.entries()[0]["size"]
+	removed = cache.prune(2 * entry_size)
+	assert [entry["key"] for entry in removed] == keys[1:3]
+	assert sorted(entry["key"] for entry in cache.entries()) == sorted([keys[0], keys[3]])
+
+	assert len(cache.clear()) == 2
+	assert cache.entries() == []
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+from src.read_raw import EVENT_DTYPE, TIMESTAMP_PERIOD
+from src.filters import BackgroundActivityFilter, RefractoryFilter, HotPixelFilter, apply_filters, compute_pixel_event_rate
+
+WIDTH, HEIGHT = 32, 16
+
+
+def make_events(num_events: int, seed: int = 0, duration_us: int = 100000) -> np.ndarray:
+	rng = np.random.default_rng(seed)
+	events = np.zeros(num_events, dtype=EVENT_DTYPE)
+	events['x'] = rng.integers(0, WIDTH, num_events)
+	events['y'] = rng.integers(0, HEIGHT, num_events)
+	events['t'] = np.sort(rng.integers(0, duration_us, num_events))
+	events['p'] = rng.integers(0, 2, num_events)
+	return events
+
+
+def make_filters():
+	hot_mask = np.zeros((HEIGHT, WIDTH), dtype=bool)
+	hot_mask[3, 5] = True
+	return [HotPixelFilter(hot_mask), RefractoryFilter(WIDTH, HEIGHT, 10), BackgroundActivityFilter(WIDTH, HEIGHT, 1000)]
+
+
+@pytest.mark.parametrize("index", range(3))
+def test_empty_chunk_passes_through(index):
+	event_filter = make_filters()[index]
+	event_filter(make_events(500))
+	last_t = getattr(event_filter, 'last_t', np.zeros(0)).copy()
+	counts = (event_filter.num_input, event_filter.num_output)
+
+	kept = event_filter(np.zeros(0, dtype=EVENT_DTYPE))
+
+	assert len(kept) == 0 and kept.dtype == EVENT_DTYPE
+	assert (event_filter.num_input, event_filter.num_output) == counts
+	np.testing.assert_array_equal(getattr(event_filter, 'last_t', np.zeros(0)), last_t)
+
+
+def test_empty_chunks_do_not_change_result():
+	events = make_events(2000, seed=1)
+	empty = np.zeros(0, dtype=EVENT_DTYPE)
+	chunks = [(events[i:i + 300], None) for i in range(0, len(events), 300)]
+	with_empty = [chunk for pair in zip([(empty, None)] * len(chunks), chunks) for chunk in pair]
+
+	expected = np.concatenate([e for e, _ in apply_filters(chunks, make_filters())])
+	result = np.concatenate([e for e, _ in apply_filters(with_empty, make_filters())])
+	np.testing.assert_array_equal(result, expected)
+
+
+# 逐个事件的参考实现，像素时间戳表包括被滤掉的事件
+
+def reference_hot_pixel(events, ts, hot_mask):
+	return np.array([not hot_mask[e['y'], e['x']] for e in events], dtype=bool)
+
+
+def reference_refractory(events, ts, period_us):
+	last_t = {}
+	keep = []
+	for e, t in zip(events, ts):
+		pixel = (int(e['x']), int(e['y']))
+		keep.append(pixel not in last_t or t - last_t[pixel] >= period_us)
+		last_t[pixel] = t
+	return np.array(keep, dtype=bool)
+
+
+def reference_background_activity(events, ts, dt_us):
+	last_t = {}
+	keep = []
+	for e, t in zip(events, ts):
+		x, y = int(e['x']), int(e['y'])
+		neighbors = [(x + dx, y + dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dx != 0 or dy != 0]
+		keep.append(any(n in last_t and t - last_t[n] <= dt_us for n in neighbors))
+		last_t[(x, y)] = t
+	return np.array(keep, dtype=bool)
+
+
+def reference_filter_chain(events, ts, hot_mask, period_us, dt_us):
+	for reference, parameter in ((reference_hot_pixel, hot_mask), (reference_refractory, period_us),
+								 (reference_background_activity, dt_us)):
+		keep = reference(events, ts, parameter)
+		events, ts = events[keep], ts[keep]
+	return events
+
+
+HOT_MASK = np.zeros((HEIGHT, WIDTH), dtype=bool)
+HOT_MASK[3, 5] = HOT_MASK[10, 20] = True
+PERIOD_US, DT_US = 300000, 20000
+
+
+@pytest.fixture(scope='module')
+def long_recording():
+	"""40秒的录制和参考实现的滤波结果"""
+	events = make_events(20000, seed=2, duration_us=40000000)
+	expected = reference_filter_chain(events, events['t'].astype(np.int64), HOT_MASK, PERIOD_US, DT_US)
+	assert 0 < len(expected) < len(events) // 2
+	return events, expected
+
+
+@pytest.mark.parametrize("chunk_size", [7, 1000, 20000])
+@pytest.mark.parametrize("wrapped", [False, True])
+def test_chunked_filters_match_reference(long_recording, chunk_size, wrapped):
+	events, expected = (array.copy() for array in long_recording)
+	if wrapped:
+		# 输入的时间戳按24位回绕两次
+		events['t'] %= TIMESTAMP_PERIOD
+		expected['t'] %= TIMESTAMP_PERIOD
+	filters = [HotPixelFilter(HOT_MASK), RefractoryFilter(WIDTH, HEIGHT, PERIOD_US), BackgroundActivityFilter(WIDTH, HEIGHT, DT_US)]
+	chunks = [(events[i:i + chunk_size], None) for i in range(0, len(events), chunk_size)]
+	result = np.concatenate([e for e, _ in apply_filters(chunks, filters)])
+	np.testing.assert_array_equal(result, expected)
+	assert filters[-1].num_output == len(expected)
+
+
+def test_pixel_event_rate_with_wrap():
+	events = make_events(20000, seed=3, duration_us=40000000)
+	expected = compute_pixel_event_rate(events, WIDTH, HEIGHT)
+	events['t'] %= TIMESTAMP_PERIOD
+	np.testing.assert_allclose(compute_pixel_event_rate(events, WIDTH, HEIGHT), expected)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from src.read_raw import EVENT_DTYPE, TRIGGER_EVENT_DTYPE, TIMESTAMP_PERIOD, iter_evt3_chunks, scan_evt3_triggers
+from src.write_raw import save_events_to_raw
+from src.merge_events import trigger_edge_times, estimate_clock_model, merge_event_streams
+
+HEADER = {'width': 160, 'height': 120}
+DURATION_US = 40000000
+NUM_EVENTS = 100000
+# 相机1的时钟比参考时钟快 CLOCK_OFFSET_US 微秒
+CLOCK_OFFSET_US = 777
+
+
+def make_recording(filename: str, seed: int, clock_offset: int) -> np.ndarray:
+	"""生成一段40秒（时间戳回绕两次）的录制，返回参考时钟下的事件时间"""
+	rng = np.random.default_rng(seed)
+	ref_ts = np.sort(rng.integers(0, DURATION_US, NUM_EVENTS))
+	events = np.zeros(NUM_EVENTS, dtype=EVENT_DTYPE)
+	events['t'] = (ref_ts + clock_offset) % TIMESTAMP_PERIOD
+	events['x'] = rng.integers(0, 160, NUM_EVENTS)
+	events['y'] = rng.integers(0, 120, NUM_EVENTS)
+	events['p'] = rng.integers(0, 2, NUM_EVENTS)
+
+	# 每10毫秒一个曝光：上升沿开始，5毫秒后下降沿
+	edges = np.arange(1000, DURATION_US, 5000)
+	trigger_events = np.zeros(len(edges), dtype=TRIGGER_EVENT_DTYPE)
+	trigger_events['t'] = (edges + clock_offset) % TIMESTAMP_PERIOD
+	trigger_events['value'] = np.arange(len(edges)) % 2 == 0
+
+	save_events_to_raw(events, trigger_events, HEADER, filename)
+	return ref_ts
+
+
+@pytest.fixture(scope='module')
+def recordings(tmp_path_factory):
+	directory = tmp_path_factory.mktemp('merge')
+	files = [str(directory / 'cam0.raw'), str(directory / 'cam1.raw')]
+	ref_ts = [make_recording(files[0], 0, 0), make_recording(files[1], 1, CLOCK_OFFSET_US)]
+	return files, ref_ts
+
+
+def test_scan_triggers_unwraps(recordings):
+	files, _ = recordings
+	edges = trigger_edge_times(scan_evt3_triggers(files[0], chunk_bytes=1 << 14))
+	np.testing.assert_array_equal(edges, np.arange(1000, DURATION_US, 10000))
+
+
+def test_merge_wrapped_recordings(recordings):
+	files, ref_ts = recordings
+	edges = [trigger_edge_times(scan_evt3_triggers(f)) for f in files]
+	clock_models = [estimate_clock_model(edges[0], e) for e in edges]
+	assert clock_models[1][0] == pytest.approx(1.0)
+	assert clock_models[1][1] == pytest.approx(-CLOCK_OFFSET_US, abs=1e-3)
+
+	streams = [iter_evt3_chunks(f, chunk_bytes=1 << 16) for f in files]
+	chunks = list(merge_event_streams(streams, clock_models))
+	events = np.concatenate([events for events, _ in chunks])
+	trigger_events = np.concatenate([trigger_events for _, trigger_events in chunks])
+
+	assert len(events) == 2 * NUM_EVENTS
+	assert len(trigger_events) == 2 * len(edges[0]) * 2
+	assert np.all(np.diff(events['t'].astype(np.int64)) >= 0)
+	assert np.all(np.diff(trigger_events['t'].astype(np.int64)) >= 0)
+	for camera in range(2):
+		np.testing.assert_array_equal(events['t'][events['camera'] == camera], ref_ts[camera])
+
+
+def test_merge_rejects_unsorted_stream():
+	events = np.zeros(3, dtype=EVENT_DTYPE)
+	events['t'] = [100, 5000, 200]
+	stream = iter([(events, np.zeros(0, dtype=TRIGGER_EVENT_DTYPE))])
+	with pytest.raises(ValueError):
+		list(merge_event_streams([stream], [(1.0, 0.0)]))
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from src.read_raw import EVENT_DTYPE, TRIGGER_EVENT_DTYPE, TIMESTAMP_PERIOD
+from src.slice_events import trigger_windows, slice_events_by_triggers
+
+
+def make_events(ts) -> np.ndarray:
+	events = np.zeros(len(ts), dtype=EVENT_DTYPE)
+	events['t'] = ts
+	return events
+
+
+def make_triggers(ts, ids, values) -> np.ndarray:
+	trigger_events = np.zeros(len(ts), dtype=TRIGGER_EVENT_DTYPE)
+	trigger_events['t'] = ts
+	trigger_events['id'] = ids
+	trigger_events['value'] = values
+	return trigger_events
+
+
+def reference_windows(ts, trigger_ts, trigger_ids, trigger_values, trigger_id, start_value):
+	"""逐个边沿配对、逐个窗口用布尔掩码求下标范围的参考实现"""
+	windows = []
+	channel = [(t, v) for t, i, v in zip(trigger_ts, trigger_ids, trigger_values) if i == trigger_id]
+	for (t0, v0), (t1, v1) in zip(channel[:-1], channel[1:]):
+		if v0 == start_value and v1 != start_value:
+			inside = np.flatnonzero((ts >= t0) & (ts < t1))
+			begin = inside[0] if len(inside) else np.searchsorted(ts, t0)
+			windows.append((t0, t1, begin, begin + len(inside)))
+	return windows
+
+
+def test_unpaired_edges_are_ignored():
+	# 通道0：开头的下降沿、连续两个上升沿、结尾的上升沿都没有配对；通道1的边沿不参与
+	trigger_events = make_triggers([5, 10, 20, 30, 35, 40, 50, 60], [0, 0, 1, 0, 0, 0, 1, 0], [0, 1, 0, 1, 1, 0, 1, 1])
+	t_start, t_end = trigger_windows(trigger_events, trigger_id=0, start_value=1)
+	np.testing.assert_array_equal(t_start, [35])
+	np.testing.assert_array_equal(t_end, [40])
+	t_start, t_end = trigger_windows(trigger_events, trigger_id=0, start_value=0)
+	np.testing.assert_array_equal(t_start, [5, 40])
+	np.testing.assert_array_equal(t_end, [10, 60])
+
+
+@pytest.mark.parametrize("start_value", [0, 1])
+def test_matches_reference(start_value):
+	rng = np.random.default_rng(0)
+	ts = np.sort(rng.integers(0, 1000000, 20000))
+	trigger_ts = np.sort(rng.integers(0, 1000000, 400))
+	trigger_ids = rng.integers(0, 2, 400)
+	trigger_values = rng.integers(0, 2, 400)
+
+	t_start, t_end, begin, end = slice_events_by_triggers(make_events(ts), make_triggers(trigger_ts, trigger_ids, trigger_values),
+														  trigger_id=1, start_value=start_value)
+	expected = reference_windows(ts, trigger_ts, trigger_ids, trigger_values, 1, start_value)
+	assert len(expected) > 0
+	assert list(zip(t_start, t_end, begin, end)) == expected
+
+
+def test_wrapped_timestamps():
+	# 40秒的录制，事件和触发事件的时间戳都按24位回绕；每5毫秒一个曝光，其中混入未配对的边沿
+	rng = np.random.default_rng(1)
+	ts = np.sort(rng.integers(0, 40000000, 200000))
+	trigger_ts = np.arange(1000, 40000000, 2500)
+	trigger_values = (np.arange(len(trigger_ts)) % 2 == 0).astype(np.uint8)
+	trigger_values[::97] ^= 1
+	trigger_ids = np.zeros(len(trigger_ts), dtype=np.uint8)
+
+	wrapped = slice_events_by_triggers(make_events(ts % TIMESTAMP_PERIOD),
+									   make_triggers(trigger_ts % TIMESTAMP_PERIOD, trigger_ids, trigger_values))
+	unwrapped = slice_events_by_triggers(make_events(ts), make_triggers(trigger_ts, trigger_ids, trigger_values))
+	for wrapped_array, unwrapped_array in zip(wrapped, unwrapped):
+		np.testing.assert_array_equal(wrapped_array, unwrapped_array)
+
+	t_start, t_end, begin, end = wrapped
+	assert t_start[-1] > TIMESTAMP_PERIOD * 2
+	assert np.all(t_end > t_start) and np.all(np.diff(t_start.astype(np.int64)) > 0)
+	assert list(zip(t_start, t_end, begin, end)) == reference_windows(ts, trigger_ts, trigger_ids, trigger_values, 0, 1)
+
+
+def test_unsorted_events_raise():
+	with pytest.raises(ValueError):
+		slice_events_by_triggers(make_events([100, 5000, 200]), make_triggers([], [], []))
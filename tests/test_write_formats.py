@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+from src.read_raw import EVENT_DTYPE, TRIGGER_EVENT_DTYPE
+from src.write_formats import save_events_to_arrow, save_event_chunks_to_arrow, save_events_to_parquet, trigger_events_filename
+from src.read_arrow import read_arrow_events, iter_arrow_batches
+
+pytest.importorskip('pyarrow')
+
+HEADER = {'format': 'EVT3;height=120;width=160', 'width': 160, 'height': 120, 'header_text': '% format EVT3;height=120;width=160\n% end'}
+
+
+def make_events(num_events: int, seed: int = 0) -> np.ndarray:
+	rng = np.random.default_rng(seed)
+	events = np.zeros(num_events, dtype=EVENT_DTYPE)
+	events['x'] = rng.integers(0, 160, num_events)
+	events['y'] = rng.integers(0, 120, num_events)
+	events['t'] = np.sort(rng.integers(0, 5000000, num_events))
+	events['p'] = rng.integers(0, 2, num_events)
+	return events
+
+
+def make_triggers(num_triggers: int, seed: int = 1) -> np.ndarray:
+	rng = np.random.default_rng(seed)
+	trigger_events = np.zeros(num_triggers, dtype=TRIGGER_EVENT_DTYPE)
+	trigger_events['t'] = np.sort(rng.integers(0, 5000000, num_triggers))
+	trigger_events['id'] = rng.integers(0, 16, num_triggers)
+	trigger_events['value'] = rng.integers(0, 2, num_triggers)
+	return trigger_events
+
+
+def assert_columns_equal(columns, array):
+	assert list(columns) == list(array.dtype.names)
+	for name in array.dtype.names:
+		assert columns[name].dtype == array.dtype[name]
+		np.testing.assert_array_equal(columns[name], array[name])
+
+
+def test_arrow_round_trip_is_zero_copy(tmp_path):
+	events, trigger_events = make_events(10000), make_triggers(100)
+	filename = str(tmp_path / 'events.arrow')
+	save_events_to_arrow(events, trigger_events, HEADER, filename)
+
+	events_columns, trigger_columns, header = read_arrow_events(filename)
+	assert_columns_equal(events_columns, events)
+	assert_columns_equal(trigger_columns, trigger_events)
+	assert header['width'] == 160 and header['height'] == 120
+	assert header['header_text'] == HEADER['header_text']
+	for column in list(events_columns.values()) + list(trigger_columns.values()):
+		assert not column.flags['OWNDATA']
+		assert not column.flags['WRITEABLE']
+
+
+def test_arrow_chunked_round_trip(tmp_path):
+	events, trigger_events = make_events(10000), make_triggers(100)
+	filename = str(tmp_path / 'events.arrow')
+	chunks = [(events[i:i + 3000], trigger_events[i // 100:(i + 3000) // 100]) for i in range(0, len(events), 3000)]
+	save_event_chunks_to_arrow(chunks, HEADER, filename)
+
+	batches = list(iter_arrow_batches(filename))
+	assert [len(batch['t']) for batch in batches] == [3000, 3000, 3000, 1000]
+	assert all(not batch['t'].flags['OWNDATA'] for batch in batches)
+	events_columns, trigger_columns, _ = read_arrow_events(filename)
+	assert_columns_equal(events_columns, events)
+	assert_columns_equal(trigger_columns, trigger_events)
+	assert len(list(iter_arrow_batches(trigger_events_filename(filename)))) == 4
+
+
+def test_arrow_empty(tmp_path):
+	filename = str(tmp_path / 'events.arrow')
+	save_events_to_arrow(make_events(0), make_triggers(0), HEADER, filename)
+	events_columns, trigger_columns, _ = read_arrow_events(filename)
+	assert_columns_equal(events_columns, make_events(0))
+	assert_columns_equal(trigger_columns, make_triggers(0))
+
+
+def row_group_t_ranges(filename):
+	import pyarrow.parquet as pq
+
+	metadata = pq.ParquetFile(filename).metadata
+	column = metadata.schema.names.index('t')
+	ranges = []
+	for i in range(metadata.num_row_groups):
+		statistics = metadata.row_group(i).column(column).statistics
+		assert statistics.has_min_max
+		ranges.append((statistics.min, statistics.max, metadata.row_group(i).num_rows))
+	return ranges
+
+
+def read_parquet(filename):
+	import pyarrow.parquet as pq
+
+	table = pq.read_table(filename)
+	return {name: table.column(name).to_numpy() for name in table.column_names}, table.schema.metadata
+
+
+@pytest.mark.parametrize("wrapped", [False, True])
+def test_parquet_round_trip(tmp_path, wrapped):
+	events, trigger_events = make_events(20000), make_triggers(100)
+	if wrapped:
+		# 40秒的录制，EVT3时间戳回绕两次
+		events['t'] = np.sort(np.random.default_rng(2).integers(0, 40000000, len(events))) % (1 << 24)
+		trigger_events['t'] = np.sort(np.random.default_rng(3).integers(0, 40000000, len(trigger_events))) % (1 << 24)
+	filename = str(tmp_path / 'events.parquet')
+	save_events_to_parquet(events, trigger_events, HEADER, filename, row_group_duration_us=1000000)
+
+	for name, array in ((filename, events), (trigger_events_filename(filename), trigger_events)):
+		columns, metadata = read_parquet(name)
+		assert_columns_equal(columns, array)
+		assert metadata[b'header_text'].decode('utf-8') == HEADER['header_text']
+		assert metadata[b'width'] == b'160'
+
+		ranges = row_group_t_ranges(name)
+		assert sum(num_rows for _, _, num_rows in ranges) == len(array)
+		for t_min, t_max, _ in ranges:
+			assert t_max - t_min < 1000000
+	if wrapped:
+		assert len(row_group_t_ranges(filename)) == 42
+
+
+def test_parquet_rejects_unsorted(tmp_path):
+	events = make_events(100)
+	events['t'] = events['t'][::-1]
+	with pytest.raises(ValueError):
+		save_events_to_parquet(events, make_triggers(0), HEADER, str(tmp_path / 'events.parquet'))
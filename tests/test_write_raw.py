@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from src.read_raw import EVENT_DTYPE, TRIGGER_EVENT_DTYPE, read_evt3_events
+from src.write_raw import save_events_to_raw, save_event_chunks_to_raw
+
+HEADER = {'width': 64, 'height': 32}
+PERIOD = 1 << 24
+
+
+def make_events(ts) -> np.ndarray:
+	events = np.zeros(len(ts), dtype=EVENT_DTYPE)
+	events['t'] = ts
+	events['x'] = np.arange(len(ts)) % 50
+	events['y'] = np.arange(len(ts)) // 7 % 32
+	events['p'] = np.arange(len(ts)) % 3 == 0
+	return events
+
+
+def make_triggers(ts) -> np.ndarray:
+	trigger_events = np.zeros(len(ts), dtype=TRIGGER_EVENT_DTYPE)
+	trigger_events['t'] = ts
+	trigger_events['value'] = np.arange(len(ts)) % 2
+	return trigger_events
+
+
+def test_timestamps_beyond_24_bits_raise(tmp_path):
+	with pytest.raises(ValueError):
+		save_events_to_raw(make_events([100, PERIOD + 5]), make_triggers([]), HEADER, str(tmp_path / 'a.raw'))
+
+
+def test_wrap_timestamps_encodes_low_bits(tmp_path):
+	filename = str(tmp_path / 'a.raw')
+	save_events_to_raw(make_events([100, PERIOD + 5]), make_triggers([]), HEADER, filename, wrap_timestamps=True)
+	np.testing.assert_array_equal(read_evt3_events(filename)[0]['t'], [100, 5])
+
+
+def test_unsorted_timestamps_raise(tmp_path):
+	with pytest.raises(ValueError):
+		save_events_to_raw(make_events([5000, 100]), make_triggers([]), HEADER, str(tmp_path / 'a.raw'))
+
+
+def test_wrapped_recording_round_trips(tmp_path):
+	rng = np.random.default_rng(0)
+	events = make_events(np.sort(rng.integers(0, 3 * PERIOD, 20000)) % PERIOD)
+	trigger_events = make_triggers(np.sort(rng.integers(0, 3 * PERIOD, 30)) % PERIOD)
+
+	filename = str(tmp_path / 'a.raw')
+	save_events_to_raw(events, trigger_events, HEADER, filename)
+	decoded_events, decoded_triggers, _ = read_evt3_events(filename)
+	np.testing.assert_array_equal(decoded_events, events)
+	np.testing.assert_array_equal(decoded_triggers, trigger_events)
+
+	# 分块编码时回绕状态在块之间保持
+	chunks = [(events[i:i + 3000], make_triggers([])) for i in range(0, len(events), 3000)]
+	save_event_chunks_to_raw(chunks, HEADER, filename)
+	np.testing.assert_array_equal(read_evt3_events(filename)[0], events)
+
+
+@pytest.mark.parametrize("field, value", [('value', 2), ('value', 0x81), ('id', 0x10)])
+def test_trigger_out_of_range_raises(tmp_path, field, value):
+	trigger_events = make_triggers([10, 20])
+	trigger_events[field][1] = value
+	with pytest.raises(ValueError):
+		save_events_to_raw(make_events([5, 30]), trigger_events, HEADER, str(tmp_path / 'a.raw'))